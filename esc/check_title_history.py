@@ -5,8 +5,8 @@ from collections import defaultdict, namedtuple
 from operator import attrgetter
 from pathlib import Path
 from intervaltree import Interval, IntervalTree
-from ck2parser import (rootpath, vanilladir, is_codename, TopLevel, Number,
-                       Pair, Obj, Date as ASTDate, Comment, SimpleParser,
+from ck2parser import (rootpath, vanilladir, TopLevel, Number, Pair, Obj,
+                       Date as ASTDate, Comment, Selector, SimpleParser,
                        FullParser)
 from print_time import print_time
 
@@ -332,22 +332,17 @@ def main():
     title_djls = {}
     histories = {}
     current_index = 0
-    def recurse(tree, stack=[]):
-        nonlocal current_index
-        for n, v in tree:
-            if is_codename(n.val):
-                cap = v.get('capital', Number(0)).val
-                histories[n.val] = TitleHistory(n.val,
-                                                stack[-1] if stack else 0,
-                                                cap)
-                landed_titles_index[n.val] = current_index
-                current_index += 1
-                stack.append(n.val)
-                title_djls[n.val] = stack.copy()
-                recurse(v, stack=stack)
-                stack.pop()
+    selector = Selector('[codename]+')
     for _, tree in simple_parser.parse_files('common/landed_titles/*.txt'):
-        recurse(tree)
+        for _, (n, v), parents in selector.findall(tree):
+            stack = [key.val for key in parents]
+            cap = v.get('capital', Number(0)).val
+            histories[n.val] = TitleHistory(n.val, stack[-1] if stack else 0,
+                                            cap)
+            landed_titles_index[n.val] = current_index
+            current_index += 1
+            stack.append(n.val)
+            title_djls[n.val] = stack
     date_filter = IntervalTree()
     if not CLEANUP_TITLE_HISTORY:
         if PRUNE_ALL_BUT_DATES:
@@ -8,7 +8,7 @@ import string
 import sys
 
 from lupa import LuaRuntime
-from ck2parser import Obj, SimpleParser
+from ck2parser import Obj, Scan, SimpleParser
 from print_time import print_time
 
 # python 3.11 for lupa for now
@@ -73,9 +73,9 @@ def get_defines(parser):
     return defines["NDefines"]
 
 
-def get_cultures(parser):
+def get_cultures(trees):
     culture_group = {}
-    for _, tree in parser.parse_files("common/cultures/*.txt"):
+    for _, tree in trees:
         for n, v in tree:
             for n2, v2 in v:
                 if n2.val not in [
@@ -87,9 +87,9 @@ def get_cultures(parser):
     return culture_group
 
 
-def get_religions(parser):
+def get_religions(trees):
     religion_group = {}
-    for _, tree in parser.parse_files("common/religions/*.txt"):
+    for _, tree in trees:
         for n, v in tree:
             if n.val == "secret_religion_visibility_trigger":
                 continue
@@ -104,16 +104,16 @@ def get_religions(parser):
     return religion_group
 
 
-def get_governments(parser):
+def get_governments(trees):
     government_group = {}
-    for _, tree in parser.parse_files("common/governments/*.txt"):
+    for _, tree in trees:
         for n, v in tree:
             for n2, v2 in v:
                 government_group[n2.val] = n.val
     return government_group
 
 
-def get_troops(parser, game_data):
+def get_troops(trees, game_data):
     defines = game_data["defines"]["NMilitary"]
     attrs = ["morale", "maintenance"] + [
         f"phase_{p}_{x}" for p, x in product(constants["phases"], ["attack", "defense"])
@@ -123,20 +123,20 @@ def get_troops(parser, game_data):
         for t in constants["basic_troop_types"]
         if t != "special_troops"
     }
-    for _, tree in parser.parse_files("common/special_troops/*.txt"):
+    for _, tree in trees:
         for n, v in tree:
             troops[n.val] = {n2.val: v2.val for n2, v2 in v}
     return troops
 
 
-def get_buildings(parser, game_data):
+def get_buildings(trees, game_data):
     troop_effect_p = (
         "("
         + "|".join(re.escape(t) for t in game_data["troops"])
         + ")(_(morale|offensive|defensive))?"
     )
     buildings = {}
-    for _, tree in parser.parse_files("common/buildings/*.txt"):
+    for _, tree in trees:
         for n, v in tree:
             for n2, v2 in v:
                 b = {"holding_type": n.val}
@@ -166,7 +166,7 @@ def get_buildings(parser, game_data):
     return buildings
 
 
-def get_retinues(parser, game_data):
+def get_retinues(trees, game_data):
     # initial cost (gold per troop)
     #     = troop maintenance number * RETINUE_HIRE_COST_MULTIPLIER(0.14)
     #  OR = hire_cost of retinue / number of troops
@@ -179,7 +179,7 @@ def get_retinues(parser, game_data):
     # retinue cap usage (per troop)
     #     = troop maintenance number
     retinues = {}
-    for _, tree in parser.parse_files("common/retinue_subunits/*.txt"):
+    for _, tree in trees:
         for n, v in tree:
             r = {}
             r[constants["basic_troop_types"][v["first_type"].val]] = v[
@@ -213,14 +213,14 @@ def get_retinues(parser, game_data):
     return retinues
 
 
-def get_tactics(parser, game_data):
+def get_tactics(trees, game_data):
     troop_modifier_p = (
         "("
         + "|".join(re.escape(t) for t in game_data["troops"])
         + ")_(morale|offensive|defensive)"
     )
     tactics = {}
-    for _, tree in parser.parse_files("common/combat_tactics/*.txt"):
+    for _, tree in trees:
         for n, v in tree:
             if n.val in ["flank_retreat_odds", "flank_pursue_odds"]:
                 continue
@@ -241,15 +241,16 @@ def get_tactics(parser, game_data):
     return tactics
 
 
-def get_tech(parser):
+def get_tech(trees):
     tech = {}
-    for _, v in parser.parse_file("common/technology.txt"):
-        for n2, v2 in v:
-            for _, v3 in v2:
-                for n4, _ in v3:
-                    if isinstance(n4.val, str):
-                        n4.val = n4.val.lower()
-            tech[n2.val] = v2
+    for _, tree in trees:
+        for _, v in tree:
+            for n2, v2 in v:
+                for _, v3 in v2:
+                    for n4, _ in v3:
+                        if isinstance(n4.val, str):
+                            n4.val = n4.val.lower()
+                tech[n2.val] = v2
     return tech
 
 
@@ -876,16 +877,27 @@ def main():
     # neglects religion unit bonuses e.g. reformed tengri
     parser = SimpleParser()
     parser.moddirs = get_modpath()
+    # every file is parsed once, up front, and sorted out by glob
+    scan = Scan(parser)
+    troops = scan.add("common/special_troops/*.txt")
+    buildings = scan.add("common/buildings/*.txt")
+    retinues = scan.add("common/retinue_subunits/*.txt")
+    tactics = scan.add("common/combat_tactics/*.txt")
+    tech = scan.add("common/technology.txt")
+    cultures = scan.add("common/cultures/*.txt")
+    religions = scan.add("common/religions/*.txt")
+    governments = scan.add("common/governments/*.txt")
+    scan.run()
     game_data = {}
     game_data["defines"] = get_defines(parser)
-    game_data["troops"] = get_troops(parser, game_data)
-    game_data["buildings"] = get_buildings(parser, game_data)
-    game_data["retinues"] = get_retinues(parser, game_data)
-    game_data["tactics"] = get_tactics(parser, game_data)
-    game_data["tech"] = get_tech(parser)
-    game_data["cultures"] = get_cultures(parser)
-    game_data["religions"] = get_religions(parser)
-    game_data["govt"] = get_governments(parser)
+    game_data["troops"] = get_troops(troops, game_data)
+    game_data["buildings"] = get_buildings(buildings, game_data)
+    game_data["retinues"] = get_retinues(retinues, game_data)
+    game_data["tactics"] = get_tactics(tactics, game_data)
+    game_data["tech"] = get_tech(tech)
+    game_data["cultures"] = get_cultures(cultures)
+    game_data["religions"] = get_religions(religions)
+    game_data["govt"] = get_governments(governments)
     # state = build_state(
     #     game_data,
     #     tech_level=4,
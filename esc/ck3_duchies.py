@@ -9,6 +9,7 @@ import PIL
 import PIL.Image
 from ck3parser import SimpleParser, csv_rows, Date, Pair
 from print_time import print_time
+import province_ids
 
 EARLIEST_DATE = (float('-inf'),) * 3
 
@@ -75,19 +76,12 @@ def process_map_definitions_row(row):
 
 # pre: process map definitions
 def parse_provinces_map(path):
-    def province_id(rgb):
-        return Title.rgb_id_map.get(tuple(rgb), 0)
-
-    image = PIL.Image.open(str(path))
-    image = numpy.array(image)
-    for i, j in numpy.ndindex(image.shape[0] - 1, image.shape[1] - 1):
-        province = province_id(image[i, j])
-        if province != 0:
-            neighbor_x = province_id(image[i, j + 1])
-            neighbor_y = province_id(image[i + 1, j])
-            for neighbor in [neighbor_x, neighbor_y]:
-                if neighbor != province and neighbor != 0:
-                    Title.province_graph.add_edge(province, neighbor)
+    ids = province_ids.decode(PIL.Image.open(str(path)),
+                              province_ids.color_table(Title.rgb_id_map),
+                              default=0)
+    pairs, _ = province_ids.adjacencies(ids)
+    # 0 is the lowest id, so it can only be first
+    Title.province_graph.add_edges_from(pairs[pairs[:, 0] != 0].tolist())
 
 
 def process_map_adjacencies_row(row):
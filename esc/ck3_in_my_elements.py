@@ -12,6 +12,7 @@ import networkx
 import numpy as np
 from ck3parser import rootpath, SimpleParser, csv_rows
 from print_time import print_time
+import province_ids
 
 
 def read_game_data():
@@ -49,30 +50,22 @@ def read_game_data():
         name_id_map[row[4]] = province
 
     def parse_provinces_map(path, width, skip_provinces):
-        def province_id(rgb):
-            return rgb_id_map.get(tuple(rgb), 0)
-
-        coords = defaultdict(lambda: [0, 0, 0])
         image = PIL.Image.open(str(path))
         image = image.crop((0, 0, width, image.height))
-        image = np.array(image)
-        for i, j in np.ndindex(image.shape[0] - 1, image.shape[1] - 1):
-            province = province_id(image[i, j])
-            coords[province][0] += j
-            coords[province][1] += i
-            coords[province][2] += 1
-            if province != 0 and province not in skip_provinces:
-                neighbor_x = province_id(image[i, j + 1])
-                neighbor_y = province_id(image[i + 1, j])
-                for neighbor in [neighbor_x, neighbor_y]:
-                    if neighbor != province and neighbor != 0 and neighbor not in skip_provinces:
-                        province_graph.add_edge(province, neighbor)
-
-        a = np.array(image).view(dtype='u1,u1,u1')[..., 0]
-        b = np.vectorize(lambda x: rgb_id_map[tuple(x)], otypes=[np.uint16])(a)
+        b = province_ids.decode(image, province_ids.color_table(rgb_id_map))
+        pairs, _ = province_ids.adjacencies(b)
+        for one, two in pairs.tolist():
+            if (one != 0 and one not in skip_provinces and
+                    two not in skip_provinces):
+                province_graph.add_edge(one, two)
+
+        ys, xs = np.indices(b.shape)
+        count = np.bincount(b.ravel()).tolist()
+        sum_x = np.bincount(b.ravel(), xs.ravel())
+        sum_y = np.bincount(b.ravel(), ys.ravel())
         for p in province_graph:
-            c = coords[p]
-            province_graph.nodes[p]['center'] = c[0] // c[2], c[1] // c[2]
+            province_graph.nodes[p]['center'] = (int(sum_x[p]) // count[p],
+                                                 int(sum_y[p]) // count[p])
         return b
 
     def process_map_adjacencies_row(row):
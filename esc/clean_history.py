@@ -3,7 +3,7 @@
 import csv
 import os
 import shutil
-from ck2parser import (rootpath, vanilladir, is_codename, csv_rows, files,
+from ck2parser import (rootpath, vanilladir, csv_rows, files, Selector,
                        SimpleParser)
 from print_time import print_time
 
@@ -72,13 +72,9 @@ def main():
     # clean title history
     # build list of defined titles
     titles = set()
-    def recurse(tree):
-        for n, v in tree:
-            if is_codename(n.val):
-                titles.add(n.val)
-                recurse(v)
+    selector = Selector('[codename]+')
     for _, tree in parser.parse_files('common/landed_titles/*.txt'):
-        recurse(tree)
+        titles.update(pair.key.val for _, pair, _ in selector.findall(tree))
     # delete all title history in mod not matching a title definition
     for path in files('history/titles/*.txt', basedir=modpath):
         title = path.stem
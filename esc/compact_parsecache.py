@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+import sys
+from pathlib import Path
+from ck2parser import SimpleParser, FullParser
+
+
+# usage: compact_parsecache.py [REPO_PATH...]
+# entries of the given repos that no longer match their latest commits are
+# garbage-collected; packs of other repos are only deduplicated.
+def main():
+    repo_paths = [Path(arg) for arg in sys.argv[1:]]
+    for parser_class in (SimpleParser, FullParser):
+        parser = parser_class()
+        parser.ignore_cache = True
+        parser.compact_cache(*repo_paths)
+
+
+if __name__ == '__main__':
+    main()
@@ -31,6 +31,7 @@ import PIL
 import PIL.Image
 import tabulate
 import ck2parser
+import province_ids
 
 rootpath = ck2parser.rootpath
 
@@ -250,18 +251,8 @@ def parse_file(path):
 # give mod dirs in descending lexicographical order of mod name (Z-A),
 # modified for dependencies as necessary.
 def files(glob, basedir=CKII_DIR, reverse=False):
-    result_paths = {}
-    for d in (basedir,) + tuple(modpaths):
-        # this should be cached...
-        if replace_paths := ck2parser.replace_paths_from_mod(d):
-            for k in list(result_paths.keys()):
-                if not replace_paths.isdisjoint(k.parents):
-                    del result_paths[k]
-        for p in d.glob(glob):
-            result_paths[p.relative_to(d)] = p
-    for _, p in sorted(result_paths.items(), key=lambda t: t[0].parts,
-                       reverse=reverse):
-        yield p
+    yield from ck2parser.files(glob, modpaths, basedir=basedir,
+                               reverse=reverse)
 
 def process_cultures(cultures_txts):
     for _, v in cultures_txts:
@@ -423,19 +414,12 @@ def process_map_definitions_row(row):
 
 # pre: process map definitions
 def parse_map_provinces(path):
-    def province_id(rgb):
-        return Title.rgb_id_map.get(tuple(rgb), 0)
-
-    image = PIL.Image.open(str(path))
-    image = numpy.array(image)
-    for i, j in numpy.ndindex(image.shape[0] - 1, image.shape[1] - 1):
-        province = province_id(image[i, j])
-        if province != 0:
-            neighbor_x = province_id(image[i, j + 1])
-            neighbor_y = province_id(image[i + 1, j])
-            for neighbor in [neighbor_x, neighbor_y]:
-                if neighbor != province and neighbor != 0:
-                    Title.province_graph.add_edge(province, neighbor)
+    ids = province_ids.decode(PIL.Image.open(str(path)),
+                              province_ids.color_table(Title.rgb_id_map),
+                              default=0)
+    pairs, _ = province_ids.adjacencies(ids)
+    # 0 is the lowest id, so it can only be first
+    Title.province_graph.add_edges_from(pairs[pairs[:, 0] != 0].tolist())
     seas_lakes = Title.province_graph.subgraph(Title.waters - Title.rivers)
     Title.seas = {x for x in seas_lakes if seas_lakes[x]}
 
@@ -477,13 +461,6 @@ def generate_province_map(in_path, out_dir, value):
             rgb_map[rgb_t] = color
             return color
 
-    def count_province_area(rgb):
-        try:
-            prov_area[Title.id_title_map[Title.rgb_id_map[tuple(rgb)]]] += 1
-        except KeyError:
-            pass
-        return 0
-
     if value == 'max_settlements':
         title_value = lambda title: title.max_holdings
         vmin, vmax = 1, 7
@@ -512,8 +489,12 @@ def generate_province_map(in_path, out_dir, value):
             wasteland_color = COLORMAP[1]
             water_color = COLORMAP[1]
         border = False
-        prov_area = collections.Counter()
-        numpy.apply_along_axis(count_province_area, 2, array)
+        stats = province_ids.ProvinceStats(province_ids.decode(
+            array, province_ids.color_table(Title.rgb_id_map), default=0))
+        prov_area = collections.Counter({
+            Title.id_title_map[province]: stats.area(province)
+            for province in stats.ids().tolist()
+            if province in Title.id_title_map})
         if 'max_settlements' in value:
             title_value = lambda title: (
                 title.max_holdings / prov_area[title])
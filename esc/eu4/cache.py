@@ -1,3 +1,5 @@
+import hashlib
+import os
 import pickle
 import numpy
 from functools import wraps
@@ -41,6 +43,23 @@ class NumpySerializer:
         return numpy.load(filename)
 
 
+class MmapNumpySerializer(NumpySerializer):
+    """NumpySerializer which maps the file read-only instead of reading it,
+    so that processes loading the same cache file share its pages"""
+
+    @staticmethod
+    def serialize(data, filename):
+        # written aside and renamed, so that no process maps a partial file
+        tempfile = filename.with_name('{}.{}.tmp'.format(filename.name, os.getpid()))
+        with open(str(tempfile), 'wb') as f:
+            numpy.save(f, data)
+        os.replace(str(tempfile), str(filename))
+
+    @staticmethod
+    def deserialize(filename):
+        return numpy.load(str(filename), mmap_mode='r')
+
+
 def disk_cache(serializer=PickleSerializer):
     """Cache the method result on disk
 
@@ -67,3 +86,45 @@ def disk_cache(serializer=PickleSerializer):
                 return return_value
         return wrapper
     return decorating_function
+
+
+def file_hash_disk_cache(key_files, serializer=PickleSerializer):
+    """Cache the method result on disk, keyed by the contents of files
+
+    key_files is called with self and returns the paths of the files which
+    the result is computed from. The cache file is named for a hash of
+    their contents rather than stored per eu4 version, so it stays valid
+    across versions which don't touch those files and is recomputed as
+    soon as one of them changes. The result is always read back from the
+    cache file, so a mapping serializer gives the same kind of object on
+    the first run as afterwards.
+
+    As with disk_cache, changing the code of the decorated method requires
+    clearing the cache manually, and setting eu4cachedir to None disables it
+    """
+    def decorating_function(f):
+        if not eu4cachedir:
+            return f
+
+        @wraps(f)
+        def wrapper(self):
+            # several results are often keyed by the same files, so their
+            # hash is worked out once per object
+            file_hashes = self.__dict__.setdefault('_file_hashes', {})
+            digest = file_hashes.get(key_files)
+            if digest is None:
+                m = hashlib.blake2b(digest_size=16)
+                for path in key_files(self):
+                    data = path.read_bytes()
+                    m.update(len(data).to_bytes(8, 'little'))
+                    m.update(data)
+                digest = file_hashes[key_files] = m.hexdigest()
+            cachedir_with_module = eu4cachedir.parent / 'by_hash' / f.__module__
+            cachedir_with_module.mkdir(parents=True, exist_ok=True)
+            cachefile = cachedir_with_module / '{}-{}.{}'.format(
+                f.__name__, digest, serializer.get_file_extension())
+            if not cachefile.exists():
+                serializer.serialize(f(self), cachefile)
+            return serializer.deserialize(cachefile)
+        return wrapper
+    return decorating_function
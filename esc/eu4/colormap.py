@@ -4,7 +4,6 @@ import numpy as np
 from PIL import Image
 from localpaths import rootpath
 from colormath import color_objects
-from _collections import OrderedDict
 from eu4.cache import cached_property
 from eu4.paths import eu4outpath
 from eu4.mapparser import Eu4MapParser
@@ -46,6 +45,8 @@ class ColorMapGenerator:
 
         # caching the border image
         self._borderlayer = None
+        # caching the stripe index of each pixel for create_shaded_image
+        self._stripes = {}
 
         # to check that one name isn't used for multiple things. e.g. an area and region with the same internal name
         self.name_to_type = {}
@@ -125,12 +126,11 @@ class ColorMapGenerator:
 
     def calculate_boundaries(self, province_list, margin=10):
         """ calculate the min_x, max_x, min_y, max_y of the given provinces on the map and add a margin"""
-        c = np.isin(self.mapparser.positions_to_provinceID_array, province_list).nonzero()
-
-        min_y = c[0].min() - margin
-        min_x = c[1].min() - margin
-        max_y = c[0].max() + margin
-        max_x = c[1].max() + margin
+        min_x, max_x, min_y, max_y = self.mapparser.province_stats.bounds(province_list)
+        min_x -= margin
+        max_x += margin
+        min_y -= margin
+        max_y += margin
 
         # make sure the max and min values are not outside the image
         min_y = max(0, min_y)
@@ -150,21 +150,27 @@ class ColorMapGenerator:
             self._borderlayer = Image.open(str(borders_path))
         out.paste(self._borderlayer, mask=self._borderlayer)
 
+    def _provinces_by_category(self, color_to_provinces):
+        """yields each category with the set of provinces it contains"""
+        for category, provinceIdList in color_to_provinces.items():
+            if isinstance(provinceIdList, str):
+                provinceIdList = provinceIdList.split()
+            yield category, {y for x in provinceIdList for y in (self.get_contains_dict().get(x, None) or (int(x),))}
+
     def generate_mapimage_object_with_several_colors(self, color_to_provinces, crop_to_color=None, margin=10):
         prov_color_lut = np.copy(self.prov_color_lut_base)
 
         provinces_used_for_cropping = []
-        for category in color_to_provinces:
-            provinceIdList = color_to_provinces[category]
-            if isinstance(provinceIdList, str):
-                provinceIdList = provinceIdList.split()
-            provs = {y for x in provinceIdList for y in (self.get_contains_dict().get(x, None) or (int(x),))}
+        for category, provs in self._provinces_by_category(color_to_provinces):
             if crop_to_color == category or crop_to_color == True:  # true means to include all colored provinces
                 provinces_used_for_cropping.extend(provs)
             for prov in provs:
                 prov_color_lut[prov] = self.convert_color_to_np_type(category)
 
         out_a = prov_color_lut[self.mapparser.positions_to_provinceID_array]
+        return self._finish_mapimage(out_a, crop_to_color, provinces_used_for_cropping, margin)
+
+    def _finish_mapimage(self, out_a, crop_to_color, provinces_used_for_cropping, margin):
         out = Image.fromarray(out_a)
         self.add_province_borders(out)
 
@@ -176,25 +182,72 @@ class ColorMapGenerator:
 
         return out
 
-    def create_shaded_image(self, color_to_provinces, color_to_provinces_without_shading=None, name='',
-                            crop_to_color=None, margin=10):
-        color_first_image = color_to_provinces.copy()
-        color_second_image = OrderedDict(reversed(list(color_to_provinces.items())))
-        if color_to_provinces_without_shading:
-            for k, v in color_to_provinces_without_shading.items():
-                color_first_image[k] = v
-                color_second_image[k] = v
-        first_image = self.generate_mapimage_object_with_several_colors(color_first_image, crop_to_color, margin)
-        second_image = self.generate_mapimage_object_with_several_colors(color_second_image, crop_to_color, margin)
-        shaded_image = Image.new(first_image.mode, first_image.size)
-        for x in range(first_image.width):
-            for y in range(first_image.height):
-                if (x+y) % 6 < 3:
-                    source_image_for_current_pixel = first_image
-                else:
-                    source_image_for_current_pixel = second_image
-
-                shaded_image.putpixel((x, y), source_image_for_current_pixel.getpixel((x, y)))
+    def stripes(self, pattern='diagonal', stripe_width=3):
+        """the number of the stripe each pixel of the map is in.
+
+        pattern is the direction of the stripes: 'diagonal' (from the bottom
+        left to the top right), 'antidiagonal', 'horizontal' or 'vertical'
+        """
+        key = (pattern, stripe_width)
+        if key not in self._stripes:
+            height, width = self.mapparser.positions_to_provinceID_array.shape
+            y = np.arange(height, dtype=np.int32)[:, np.newaxis]
+            x = np.arange(width, dtype=np.int32)[np.newaxis, :]
+            if pattern == 'diagonal':
+                position = x + y
+            elif pattern == 'antidiagonal':
+                position = x - y + (height - 1)
+            elif pattern == 'horizontal':
+                position = np.broadcast_to(y, (height, width))
+            elif pattern == 'vertical':
+                position = np.broadcast_to(x, (height, width))
+            else:
+                raise ValueError('Unknown stripe pattern "{}"'.format(pattern))
+            self._stripes[key] = position // stripe_width
+        return self._stripes[key]
+
+    def generate_shaded_mapimage_object(self, color_to_provinces, color_to_provinces_without_shading=None,
+                                        crop_to_color=None, margin=10, pattern='diagonal', stripe_width=3):
+        """like generate_mapimage_object_with_several_colors, but provinces which are in
+        several categories get stripes of all their colors instead of the color of the
+        last category. The categories in color_to_provinces_without_shading are drawn
+        over that in solid colors.
+
+        The image is made by indexing: layer n of the lookup table has the n-th color of
+        each province (counted from the last of its categories), and each pixel takes the
+        layer of its stripe number modulo the number of colors of its province.
+        """
+        prov_colors = [[] for _ in range(len(self.prov_color_lut_base))]
+        provinces_used_for_cropping = []
+        for shaded, categories in ((True, color_to_provinces), (False, color_to_provinces_without_shading or {})):
+            for category, provs in self._provinces_by_category(categories):
+                if crop_to_color == category or crop_to_color == True:  # true means to include all colored provinces
+                    provinces_used_for_cropping.extend(provs)
+                color = self.convert_color_to_np_type(category)
+                for prov in provs:
+                    if shaded:
+                        prov_colors[prov].insert(0, color)
+                    else:
+                        prov_colors[prov] = [color]
+
+        layers = max(1, max(len(colors) for colors in prov_colors))
+        prov_color_lut = np.repeat(self.prov_color_lut_base[:, np.newaxis], layers, axis=1)
+        prov_color_count = np.ones(len(prov_colors), np.int32)
+        for prov, colors in enumerate(prov_colors):
+            if colors:
+                prov_color_lut[prov, :len(colors)] = colors
+                prov_color_count[prov] = len(colors)
+
+        ids = self.mapparser.positions_to_provinceID_array
+        if layers == 1:
+            out_a = prov_color_lut[ids, 0]
+        else:
+            out_a = prov_color_lut[ids, self.stripes(pattern, stripe_width) % prov_color_count[ids]]
+        return self._finish_mapimage(out_a, crop_to_color, provinces_used_for_cropping, margin)
 
+    def create_shaded_image(self, color_to_provinces, color_to_provinces_without_shading=None, name='',
+                            crop_to_color=None, margin=10, pattern='diagonal', stripe_width=3):
+        shaded_image = self.generate_shaded_mapimage_object(
+            color_to_provinces, color_to_provinces_without_shading, crop_to_color, margin, pattern, stripe_width)
         out_path = self.outpath / '{}.png'.format(name)
         shaded_image.save(str(out_path))
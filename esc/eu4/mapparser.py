@@ -4,11 +4,13 @@ import numpy as np
 from PIL import Image
 from ck2parser import csv_rows, Pair
 from localpaths import cachedir
+import province_ids
 from eu4.provincelists import terrain_to_provinces
 from eu4.eu4lib import Province, Continent, Area, Region, Superregion, \
     TradeCompany, Terrain, ColonialRegion, TradeNode, Eu4Color
 from eu4.parser import Eu4Parser
-from eu4.cache import disk_cache, cached_property, NumpySerializer
+from eu4.cache import disk_cache, file_hash_disk_cache, cached_property, \
+    MmapNumpySerializer
 
 
 class Eu4MapParser(Eu4Parser):
@@ -25,7 +27,6 @@ class Eu4MapParser(Eu4Parser):
         self.default_tree = self.parser.parse_file('map/default.map')
         self.random_only = {n.val for n in self.default_tree['only_used_for_random']}
         self.max_provinces = self.default_tree['max_provinces'].val
-        self.provinces_rgb_map = None
         self.regionColors = None
         if cachedir:
             self.cachedir = cachedir / self.__class__.__name__
@@ -34,49 +35,59 @@ class Eu4MapParser(Eu4Parser):
     def map_path(self, key):
         return self.parser.file('map/' + self.default_tree[key].val)
 
-    def _get_provinces_rgb_map(self):
-        if not self.provinces_rgb_map:
-            self.provinces_rgb_map = {}
-            for row in csv_rows(self.map_path('definitions')):
-                try:
-                    number = int(row[0])
-                except ValueError:
-                    continue
-                if number < self.max_provinces:
-                    rgb = tuple(np.uint8(row[1:4]))
-                    self.provinces_rgb_map[rgb] = np.uint16(number)
-
-        return self.provinces_rgb_map
+    def _province_map_files(self):
+        # default.map too, since it sets max_provinces
+        return [self.parser.file('map/default.map'),
+                self.map_path('provinces'), self.map_path('definitions')]
 
     @cached_property
-    @disk_cache(NumpySerializer)
+    @file_hash_disk_cache(_province_map_files, MmapNumpySerializer)
     def positions_to_provinceID_array(self):
         """create a two-dimensional array which contains the province id for
         each point of the provinces.bmp
+
+        the cached array is memory-mapped read-only and shared between the
+        processes which use it, so it must not be modified in place
         """
-        # the code is valid, because Image implements __array_interface__
-        # noinspection PyTypeChecker
-        pa = np.array(Image.open(str(self.map_path('provinces'))))
-        pa = pa.view('u1,u1,u1')[..., 0]
-        pa = np.vectorize(lambda x: self._get_provinces_rgb_map()[tuple(x)],
-                          otypes=[np.uint16])(pa)
-        return pa
+        table = province_ids.definitions_table(
+            csv_rows(self.map_path('definitions')), self.max_provinces)
+        return province_ids.decode(Image.open(str(self.map_path('provinces'))),
+                                   table)
 
     @cached_property
-    @disk_cache()
+    def province_stats(self):
+        """province_ids.ProvinceStats of positions_to_provinceID_array, for
+        areas, bounding boxes and pixels of provinces without a pass over
+        the map each
+
+        its arrays are cached beside the array of the map and mapped the
+        same way, so they always belong to the same map files
+        """
+        return province_ids.ProvinceStats.from_arrays(
+            self.positions_to_provinceID_array.shape,
+            self._province_stats_table, self._province_pixel_order)
+
+    # only made if one of the two arrays below isn't cached
+    @cached_property
+    def _new_province_stats(self):
+        return province_ids.ProvinceStats(self.positions_to_provinceID_array)
+
+    @cached_property
+    @file_hash_disk_cache(_province_map_files, MmapNumpySerializer)
+    def _province_stats_table(self):
+        return self._new_province_stats.table
+
+    @cached_property
+    @file_hash_disk_cache(_province_map_files, MmapNumpySerializer)
+    def _province_pixel_order(self):
+        return self._new_province_stats.order
+
+    @cached_property
+    @file_hash_disk_cache(_province_map_files)
     def all_provinceIDs(self):
         """all ids including water and wasteland, but not provinces in the RNW"""
-        province_positions = self.positions_to_provinceID_array
-        provinceIDs = []
-        for i in range(1, self.max_provinces):
-            if i in self.random_only:
-                continue
-            # check if province exists in the province map
-            prov_indices = np.nonzero(province_positions == i)
-            if not len(prov_indices[0]):
-                continue
-            provinceIDs.append(i)
-        return provinceIDs
+        return [i for i in self.province_stats.ids().tolist()
+                if 0 < i < self.max_provinces and i not in self.random_only]
 
     @cached_property
     def all_provinces(self):
@@ -124,7 +135,7 @@ class Eu4MapParser(Eu4Parser):
             if v['type'].val in inland_sea_names:
                 inland_sea_nums.update(n2.val for n2 in v['color'])
 
-        pa = self.positions_to_provinceID_array
+        stats = self.province_stats
         # the code is valid, because Image implements __array_interface__
         # noinspection PyTypeChecker
         ta = np.array(Image.open(str(self.map_path('terrain'))))
@@ -133,7 +144,7 @@ class Eu4MapParser(Eu4Parser):
             if number in is_inland_sea:
                 # skip provinces which were already set by a terrain override
                 continue
-            prov_indices = np.nonzero(pa == number)
+            prov_indices = stats.pixels(number)
             if len(prov_indices[0]):
                 terrain_num = np.argmax(np.bincount(ta[prov_indices]))
                 is_inland_sea[number] = terrain_num in inland_sea_nums
@@ -521,24 +532,9 @@ class Eu4MapParser(Eu4Parser):
     @disk_cache()
     def adjacency_map(self):
         """dictionary between provinceIDs and a set of adjacent provinceIDs"""
-        id_map = self.positions_to_provinceID_array
-        max_x = len(id_map[0])
-        max_y = len(id_map)
-        adjacency_map = {provinceID: set() for provinceID in self.all_provinceIDs}
-        for x in range(max_x):
-            for y in range(max_y):
-                provinceID = id_map[y][x]
-                if x > 0:
-                    adjacency_map[provinceID].add(id_map[y][x - 1])
-                if y > 0:
-                    adjacency_map[provinceID].add(id_map[y - 1][x])
-                if x < max_x - 1:
-                    adjacency_map[provinceID].add(id_map[y][x + 1])
-                if y < max_y - 1:
-                    adjacency_map[provinceID].add(id_map[y + 1][x])
-                # tests indicate that diagonal pixels don't count as adjacent
-                # examples:
-                # Halmaheran Sea(1400) - Flores Sea(1357)
-                # Stadacona (994) - Pekuakamiulnuatsh (2579)
-
-        return adjacency_map
+        # tests indicate that diagonal pixels don't count as adjacent
+        # examples:
+        # Halmaheran Sea(1400) - Flores Sea(1357)
+        # Stadacona (994) - Pekuakamiulnuatsh (2579)
+        return province_ids.adjacency_sets(self.positions_to_provinceID_array,
+                                           self.all_provinceIDs)
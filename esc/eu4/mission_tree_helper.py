@@ -5,8 +5,7 @@ import os
 import sys
 # add the parent folder to the path so that imports work even if the working directory is the eu4 folder
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
-import ck2parser
-from localpaths import eu4dir
+from eu4.parser import Eu4ScriptParser
 
 class MissionTreeHelper():
 
@@ -129,8 +128,7 @@ class MissionTreeHelper():
     def generate_mission_tree_completion_decisions(self):
         """ To create the images for mission trees on the wiki"""
 
-        parser =  ck2parser.SimpleParser()
-        parser.basedir = eu4dir
+        parser = Eu4ScriptParser()
 
         allmissions = []
         mission_flags = []
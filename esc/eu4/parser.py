@@ -4,13 +4,20 @@ import re
 from collections import OrderedDict
 # add the parent folder to the path so that imports work even if the working directory is the eu4 folder
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
-from ck2parser import SimpleParser, Obj
-from localpaths import eu4dir
+import pdxscript
+from pdxscript import Obj
+from localpaths import eu4dir, cachedir
 from eu4.paths import eu4_version
 from eu4.eu4lib import Religion, Idea, IdeaGroup, Policy, Eu4Color, Country
 from eu4.cache import disk_cache, cached_property
 
 
+class Eu4ScriptParser(pdxscript.SimpleParser):
+    """pdxscript profile for the script files of EU4"""
+    gamedir = eu4dir
+    cacheroot = cachedir
+
+
 class Eu4Parser:
     """the methods of this class parse game files and retrieve all kinds of information
 
@@ -22,8 +29,7 @@ class Eu4Parser:
     localizationOverrides = {}
 
     def __init__(self):
-        self.parser = SimpleParser()
-        self.parser.basedir = eu4dir
+        self.parser = Eu4ScriptParser(tokenizer='regex', engine='descent')
 
     @cached_property
     @disk_cache()
@@ -11,6 +11,7 @@ from PIL import Image, ImageFont, ImageDraw
 from ck2parser import rootpath, csv_rows, SimpleParser
 from localpaths import eu4dir
 from print_time import print_time
+import province_ids
 
 @print_time
 def main():
@@ -111,8 +112,7 @@ def main():
         provs_to_label.discard(int(n.val))
 
     image = Image.open(str(provinces_path))
-    a = np.array(image).view('u1,u1,u1')[..., 0]
-    b = np.vectorize(lambda x: rgb_number_map[tuple(x)], otypes=[np.uint16])(a)
+    b = province_ids.decode(image, province_ids.color_table(rgb_number_map))
     font = ImageFont.truetype(str(rootpath / 'ck2utils/esc/NANOTYPE.ttf'), 16)
     mod = parser.moddirs[0].name.lower() + '_' if parser.moddirs else ''
     borders_path = rootpath / (mod + 'eu4borderlayer.png')
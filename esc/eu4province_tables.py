@@ -7,6 +7,7 @@ from PIL import Image
 from ck2parser import rootpath, csv_rows, SimpleParser, Pair, Obj
 from localpaths import eu4dir
 from print_time import print_time
+import province_ids
 
 def localisation():
     localisation_dict = {}
@@ -66,10 +67,8 @@ def analyze_provinces():
         if v['type'].val in inland_sea_names:
             inland_sea_nums.update(n2.val for n2 in v['color'])
 
-    pa = np.array(Image.open(str(map_path('provinces'))))
-    pa = pa.view('u1,u1,u1')[..., 0]
-    pa = np.vectorize(lambda x: provinces_rgb_map[tuple(x)],
-                      otypes=[np.uint16])(pa)
+    pa = province_ids.decode(Image.open(str(map_path('provinces'))),
+                             province_ids.color_table(provinces_rgb_map))
     ta = np.array(Image.open(str(map_path('terrain'))))
     provs_not_found = []
     for number in provinces:
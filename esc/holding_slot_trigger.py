@@ -56,19 +56,13 @@ def main():
     cultures = ck2parser.get_cultures(simple_parser, groups=False)
     parser.fq_keys = cultures
 
-    def scan_for_baronies(tree):
-        for n, v in tree:
-            if ck2parser.is_codename(n.val):
-                if n.val[0] == 'c':
-                    baronies = sum(1 for n2, _ in v if n2.val.startswith('b_'))
-                    yield n.val, baronies
-                else:
-                    yield from scan_for_baronies(v)
-
+    # counties, and the titles they're in down to them
+    counties = ck2parser.Selector('c_*', '[ekdb]_*+/c_*')
     counties_by_barony_count = collections.defaultdict(list)
     for _, tree in parser.parse_files('common/landed_titles/*.txt'):
-        for title, baronies in scan_for_baronies(tree):
-            counties_by_barony_count[baronies].append(title)
+        for _, (n, v), _ in counties.findall(tree):
+            baronies = sum(1 for n2, _ in v if n2.val.startswith('b_'))
+            counties_by_barony_count[baronies].append(n.val)
     trigger = build_trigger(parser, counties_by_barony_count, title_id)
     parser.write(trigger, outpath)
 
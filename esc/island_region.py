@@ -9,6 +9,7 @@ from PIL import Image
 from ck2parser import (rootpath, csv_rows, SimpleParser, is_codename, Pair,
                        Number, TopLevel, FullParser)
 from print_time import print_time
+import province_ids
 
 
 @print_time
@@ -42,15 +43,14 @@ def main():
             county_id_map[county] = prov_id
     province_graph = nx.Graph()
     provinces_path = parser.file('map/' + default_tree['provinces'].val)
-    a = np.array(Image.open(str(provinces_path)))
-    for i, j in np.ndindex(a.shape[0] - 1, a.shape[1] - 1):
-        province = rgb_id_map.get(tuple(a[i, j]))
-        if province in id_county_map:
-            province_graph.add_node(province)
-            for coords in ((i, j + 1), (i + 1, j)):
-                neighbor = rgb_id_map.get(tuple(a[coords]))
-                if neighbor != province and neighbor in id_county_map:
-                    province_graph.add_edge(province, neighbor)
+    ids = province_ids.decode(Image.open(str(provinces_path)),
+                              province_ids.color_table(rgb_id_map), default=0)
+    province_graph.add_nodes_from(p for p in np.unique(ids).tolist()
+                                  if p in id_county_map)
+    pairs, _ = province_ids.adjacencies(ids)
+    province_graph.add_edges_from((one, two) for one, two in pairs.tolist()
+                                  if one in id_county_map and
+                                  two in id_county_map)
     for row in csv_rows(parser.file('map/' + default_tree['adjacencies'].val)):
         try:
             one, two = int(row[0]), int(row[1])
@@ -7,7 +7,8 @@ import re
 import shutil
 import tempfile
 from ck2parser import (rootpath, vanilladir, csv_rows, files, is_codename,
-                       get_cultures, get_localisation, SimpleParser)
+                       get_cultures, get_localisation, Selector,
+                       SimpleParser)
 from print_time import print_time
 
 modpath = rootpath / 'SWMH-BETA/SWMH'
@@ -39,21 +40,17 @@ def scan_landed_titles(parser, cultures, loc_mod):
     dynamics = collections.defaultdict(dict)
     undef = collections.defaultdict(list)
 
-    def recurse(tree):
-        for n, v in tree:
-            if is_codename(n.val):
-                for n2, v2 in v:
-                    if n2.val in cultures:
-                        dynamics[n.val][n2.val] = v2.val
-                    elif (n2.val in ['title', 'title_female', 'foa',
-                                     'title_prefix'] and
-                          v2.val not in loc_mod):
-                        undef[v2.val].append((n.val, n2.val))
-                recurse(v)
-
+    selector = Selector('[codename]+')
     for path, tree in parser.parse_files('common/landed_titles/*.txt'):
         print(path)
-        recurse(tree)
+        for _, (n, v), _ in selector.findall(tree):
+            for n2, v2 in v:
+                if n2.val in cultures:
+                    dynamics[n.val][n2.val] = v2.val
+                elif (n2.val in ['title', 'title_female', 'foa',
+                                 'title_prefix'] and
+                      v2.val not in loc_mod):
+                    undef[v2.val].append((n.val, n2.val))
     return dynamics, undef
 
 @print_time
@@ -0,0 +1,26 @@
+"""Game-independent core of the script parsers.
+
+The node classes, tokenizers, parse engines, caches, mod file system,
+selectors and scans are shared by every game; ck2parser, ck3parser and
+eu4.parser only hold profiles saying where each game lives and how its files
+differ.
+"""
+
+from pdxscript.nodes import (first_post_comment, prepend_post_comment,
+                             is_codename, chars, comments_to_str, Slotted,
+                             NO_COMMENTS, Comment, Stringifiable, Contents,
+                             Container, TopLevel, Commented, String, Number,
+                             Date, Op, Pair, Obj, Output)
+from pdxscript.codec import VERSION, dump_tree, load_tree, tree_size
+from pdxscript.tokenizers import (SimpleTokenizer, FullTokenizer,
+                                  make_scanner, ScannedToken,
+                                  SimpleRegexTokenizer, FullRegexTokenizer)
+from pdxscript.engines import (unexpected, SimpleDescentEngine, ParseEvents,
+                               FullDescentEngine)
+from pdxscript.cache import (decode_text, PackFile, CacheWriter, TreeCache,
+                             git_present)
+from pdxscript.vfs import (replace_paths_from_mod, VirtualFileSystem, get_vfs,
+                           files, file)
+from pdxscript.parser import SimpleParser, FullParser
+from pdxscript.select import Selector
+from pdxscript.scan import Scan
@@ -0,0 +1,362 @@
+import atexit
+import collections
+import contextlib
+import functools
+import io
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import traceback
+from pdxscript.codec import tree_size
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+try:
+    import git
+    git_present = True
+except ImportError:
+    git_present = False
+
+# what reading the file in text mode would give
+def decode_text(contents, encoding, errors='strict'):
+    return io.TextIOWrapper(io.BytesIO(contents), encoding=encoding,
+                            errors=errors).read()
+
+class PackFile:
+    """Append-only store of cache entries for one repo (or for vanilla).
+
+    Each record is a header, its key and its data, and a later record for a
+    key supersedes earlier ones. The file is mapped and indexed on first use,
+    after which lookups cost no syscalls. compact() rewrites it without
+    superseded, outdated or unwanted records.
+
+    Several processes may share a pack (see parse_files_parallel), so
+    appends, truncation and compaction hold an exclusive flock on a lock
+    file beside it, where fcntl exists.
+    """
+    magic = b'pdxpack\x00'
+    # key length, version, data length, time written
+    header = struct.Struct('<HHId')
+
+    def __init__(self, path):
+        self.path = path
+        self.index = None
+        self.map = None
+        self.end = None
+        # puts may come from the cache writer thread
+        self.lock = threading.RLock()
+        self.lock_depth = 0
+
+    # reentrant, as compact() opens the pack with it held. callers hold
+    # self.lock, so only one thread at a time counts the depth
+    @contextlib.contextmanager
+    def file_lock(self):
+        if fcntl is None or self.lock_depth:
+            self.lock_depth += 1
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = self.path.with_name(self.path.name + '.lock')
+        with lock_path.open('ab') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            self.lock_depth += 1
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.index = None
+
+    def remap(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        try:
+            with self.path.open('rb') as f:
+                if os.fstat(f.fileno()).st_size > len(self.magic):
+                    self.map = mmap.mmap(f.fileno(), 0,
+                                         access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            pass
+
+    def has_magic(self):
+        return self.map[:len(self.magic)] == self.magic
+
+    def records(self):
+        if self.map is None or not self.has_magic():
+            return
+        size = len(self.map)
+        pos = len(self.magic)
+        while pos + self.header.size <= size:
+            key_len, version, length, written = self.header.unpack_from(
+                self.map, pos)
+            key_pos = pos + self.header.size
+            offset = key_pos + key_len
+            if offset + length > size:
+                break
+            key = self.map[key_pos:offset].decode()
+            yield key, (version, offset, length, written)
+            pos = offset + length
+        self.end = pos
+
+    def open(self):
+        self.remap()
+        if self.map is not None and not self.has_magic():
+            # written in another format; records appended to it would never
+            # be read, so start it over
+            with self.file_lock():
+                self.remap()
+                if self.map is not None and not self.has_magic():
+                    self.map.close()
+                    self.map = None
+                    with self.path.open('wb') as f:
+                        f.write(self.magic)
+        self.end = None
+        self.index = dict(self.records())
+        if self.end is not None and self.end < len(self.map):
+            # cut off what an interrupted write left, so appends stay indexed.
+            # the tail may instead be another process's append in progress,
+            # so look again once that one is done
+            with self.file_lock():
+                self.remap()
+                self.end = None
+                self.index = dict(self.records())
+                if self.end is not None and self.end < len(self.map):
+                    self.map.close()
+                    self.map = None
+                    os.truncate(str(self.path), self.end)
+                    self.remap()
+
+    def get(self, key):
+        with self.lock:
+            if self.index is None:
+                self.open()
+            try:
+                version, offset, length, written = self.index[key]
+            except KeyError:
+                return None
+            if self.map is None or offset + length > len(self.map):
+                self.remap()
+            return version, self.map[offset:offset + length], written
+
+    def put(self, key, version, data):
+        with self.lock:
+            self._put(key, version, data)
+
+    def _put(self, key, version, data):
+        if self.index is None:
+            self.open()
+        key_bytes = key.encode()
+        written = time.time()
+        record = (self.header.pack(len(key_bytes), version, len(data),
+                                   written) + key_bytes + data)
+        flags = os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+        with self.file_lock():
+            try:
+                fd = os.open(str(self.path), flags | os.O_CREAT | os.O_EXCL,
+                             0o666)
+                os.write(fd, self.magic)
+                os.close(fd)
+            except FileExistsError:
+                pass
+            fd = os.open(str(self.path), flags | os.O_APPEND)
+            try:
+                os.write(fd, record)
+                end = os.lseek(fd, 0, os.SEEK_CUR)
+            finally:
+                os.close(fd)
+        self.index[key] = version, end - len(data), len(data), written
+
+    def compact(self, version, keep=lambda key: True):
+        with self.lock, self.file_lock():
+            return self._compact(version, keep)
+
+    def _compact(self, version, keep):
+        self.open()
+        before = sum(1 for _ in self.records())
+        live = {key: entry for key, entry in self.index.items()
+                if entry[0] == version and keep(key)}
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with temp_path.open('wb') as f:
+            f.write(self.magic)
+            for key, (_, offset, length, written) in live.items():
+                key_bytes = key.encode()
+                f.write(self.header.pack(len(key_bytes), version, length,
+                                         written))
+                f.write(key_bytes)
+                f.write(self.map[offset:offset + length])
+        self.close()
+        os.replace(str(temp_path), str(self.path))
+        return before, len(live)
+
+
+class CacheWriter:
+    """Write-behind queue for disk cache entries.
+
+    Writes are done in order by a daemon thread, started on the first put().
+    put() blocks while maxsize writes are pending, so memory held by the
+    queue stays bounded. flush() waits for all pending writes; it is also
+    registered to run at exit.
+    """
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.queue = queue.Queue(maxsize)
+        self.thread = None
+        self.writes = 0
+        self.errors = 0
+        self.max_depth = 0
+
+    def put(self, write, *args):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+        self.queue.put((write, args))
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def run(self):
+        while True:
+            write, args = self.queue.get()
+            try:
+                write(*args)
+                self.writes += 1
+            except Exception:
+                self.errors += 1
+                traceback.print_exc()
+            finally:
+                # don't keep the last writer's owner alive while idle
+                del write, args
+                self.queue.task_done()
+
+    def flush(self):
+        if self.thread is not None:
+            self.queue.join()
+
+
+class TreeCache:
+    """In-memory cache of parse trees by path, least recently used first.
+
+    Once there are more than max_entries trees, or their estimated size
+    (see tree_size) exceeds max_bytes, the least recently used trees are
+    evicted until both limits are met again. Either limit may be None for
+    no limit. Pinned paths are never evicted, though they do count toward
+    the limits.
+    """
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # path -> (tree, estimated size)
+        self.entries = collections.OrderedDict()
+        self.pinned = set()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def get(self, path):
+        try:
+            tree, _ = self.entries[path]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(path)
+        self.hits += 1
+        return tree
+
+    def __setitem__(self, path, tree):
+        self.pop(path)
+        size = tree_size(tree)
+        self.entries[path] = tree, size
+        self.size += size
+        self.evict()
+
+    def pop(self, path):
+        try:
+            tree, size = self.entries.pop(path)
+        except KeyError:
+            return None
+        self.size -= size
+        return tree
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def pin(self, path):
+        self.pinned.add(path)
+
+    def unpin(self, path):
+        self.pinned.discard(path)
+        self.evict()
+
+    def over_limit(self):
+        return (self.max_entries is not None and
+                len(self.entries) > self.max_entries or
+                self.max_bytes is not None and self.size > self.max_bytes)
+
+    def evict(self):
+        if not self.over_limit():
+            return
+        for path in list(self.entries):
+            if path not in self.pinned:
+                self.pop(path)
+                self.evictions += 1
+                if not self.over_limit():
+                    break
+
+
+@functools.lru_cache(maxsize=None)
+def open_repo(dirpath):
+    return git.Repo(str(dirpath), odbt=git.GitCmdObjectDB,
+                    search_parent_directories=True)
+
+# yield (commit, path) for each path in the output of
+# git log -z --name-only --pretty=format:%h
+def log_entries(log_output):
+    log_iter = iter(log_output.split('\x00'))
+    for entry in log_iter:
+        try:
+            commit, file_str = entry.split('\n', maxsplit=1)
+        except ValueError:
+            continue
+        while file_str:
+            yield commit, file_str
+            file_str = next(log_iter, '')
+
+def read_commit_index(path):
+    try:
+        fields = path.read_bytes().decode().split('\x00')
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None, {}
+    if len(fields) % 2 == 0:
+        return None, {}
+    return fields[0], dict(zip(fields[1::2], fields[2::2]))
+
+def write_commit_index(path, head, latest_commit):
+    fields = [head]
+    for item in latest_commit.items():
+        fields.extend(item)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name('{}.{}.tmp'.format(path.name, os.getpid()))
+    temp_path.write_bytes('\x00'.join(fields).encode())
+    os.replace(str(temp_path), str(path))
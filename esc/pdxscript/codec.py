@@ -0,0 +1,317 @@
+import gc
+import struct
+import sys
+from pdxscript.nodes import (NO_COMMENTS, Comment, TopLevel, String, Number,
+                             Date, Op, Pair, Obj, Contents)
+
+# version of the cache format. bump it when cached trees would no longer
+# load as the trees the parser makes now.
+VERSION = 4
+
+# compact binary encoding of parse trees for the disk cache, in place of
+# pickling the object graph. layout: magic, VERSION, a table of every
+# distinct string, then the nodes in order as a tag byte plus operands.
+# integers are LEB128 varints (zigzagged where signed). leaf tags combine a
+# kind with comment/force_quote flags; pairs with a plain '=' and blocks
+# with plain braces get their own tags so those Ops take no space.
+TREE_MAGIC = b'PDXT'
+LEAF_PRE, LEAF_POST, LEAF_QUOTE = 0x08, 0x10, 0x20
+(LEAF_STRING, LEAF_INT, LEAF_FLOAT, LEAF_DATE, LEAF_PACKED_DATE,
+ LEAF_OP) = range(6)
+NODE_PAIR, NODE_PLAIN_PAIR, NODE_OBJ, NODE_PLAIN_OBJ = 0x40, 0x41, 0x42, 0x43
+double = struct.Struct('<d')
+
+def dump_tree(tree):
+    strings = {}
+    out = bytearray()
+
+    def varint(n):
+        while n > 0x7f:
+            out.append(n & 0x7f | 0x80)
+            n >>= 7
+        out.append(n)
+
+    def zigzag(n):
+        varint(n << 1 if n >= 0 else (-n << 1) - 1)
+
+    def string(s):
+        i = strings.get(s)
+        if i is None:
+            i = strings[s] = len(strings)
+        varint(i)
+
+    def is_plain(op, val):
+        return (op.val == val and not op._pre_comments and
+                op.post_comment is None)
+
+    def leaf(item):
+        tag = 0
+        if item._pre_comments:
+            tag |= LEAF_PRE
+        if item.post_comment is not None:
+            tag |= LEAF_POST
+        val = item.val
+        if isinstance(item, String):
+            if item.force_quote:
+                tag |= LEAF_QUOTE
+            out.append(tag | LEAF_STRING)
+            string(val)
+        elif isinstance(item, Number):
+            if isinstance(val, int):
+                out.append(tag | LEAF_INT)
+                zigzag(val)
+            else:
+                out.append(tag | LEAF_FLOAT)
+                out.extend(double.pack(val))
+        elif isinstance(item, Date):
+            y, m, d = val
+            if 0 <= m < 16 and 0 <= d < 32:
+                out.append(tag | LEAF_PACKED_DATE)
+                packed = abs(y) << 9 | m << 5 | d
+                zigzag(packed if y >= 0 else -packed)
+            else:
+                out.append(tag | LEAF_DATE)
+                for x in val:
+                    zigzag(x)
+        else:
+            out.append(tag | LEAF_OP)
+            string(val)
+        if tag & LEAF_PRE:
+            varint(len(item._pre_comments))
+            for comment in item._pre_comments:
+                string(comment.val)
+        if tag & LEAF_POST:
+            string(item.post_comment.val)
+
+    def node(item):
+        if isinstance(item, Pair):
+            if is_plain(item.op, '='):
+                out.append(NODE_PLAIN_PAIR)
+                node(item.key)
+            else:
+                out.append(NODE_PAIR)
+                node(item.key)
+                leaf(item.op)
+            node(item.value)
+        elif isinstance(item, Obj):
+            ker = item.ker if isinstance(item.ker, Op) else Op('}')
+            plain = is_plain(item.kel, '{') and is_plain(ker, '}')
+            if plain:
+                out.append(NODE_PLAIN_OBJ)
+            else:
+                out.append(NODE_OBJ)
+                leaf(item.kel)
+            varint(len(item.contents))
+            for x in item.contents:
+                node(x)
+            if not plain:
+                leaf(ker)
+        else:
+            leaf(item)
+
+    varint(len(tree.contents))
+    for item in tree.contents:
+        node(item)
+    varint(len(tree.post_comments))
+    for comment in tree.post_comments:
+        string(comment.val)
+    body = out
+    out = bytearray(TREE_MAGIC)
+    varint(VERSION)
+    varint(len(strings))
+    if any('\0' in s for s in strings):
+        varint(1)
+        for s in strings:
+            s = s.encode()
+            varint(len(s))
+            out.extend(s)
+    else:
+        varint(0)
+        table = '\0'.join(strings).encode()
+        varint(len(table))
+        out.extend(table)
+    out.extend(body)
+    return bytes(out)
+
+# returns None if data was written by another VERSION (or isn't a tree)
+def load_tree(data):
+    pos = 0
+    new = object.__new__
+
+    def varint():
+        nonlocal pos
+        n = shift = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def zigzag():
+        n = varint()
+        return -((n + 1) >> 1) if n & 1 else n >> 1
+
+    def comment():
+        c = new(Comment)
+        c.val = table[varint()]
+        return c
+
+    def plain_op(val):
+        op = new(Op)
+        op.val = val
+        op._pre_comments = NO_COMMENTS
+        op.post_comment = None
+        return op
+
+    def leaf(tag):
+        nonlocal pos
+        kind = tag & 0x07
+        if kind == LEAF_STRING:
+            item = new(String)
+            item.val = table[varint()]
+            item.force_quote = bool(tag & LEAF_QUOTE)
+        elif kind == LEAF_INT:
+            item = new(Number)
+            item.val = zigzag()
+        elif kind == LEAF_FLOAT:
+            item = new(Number)
+            item.val = double.unpack_from(data, pos)[0]
+            pos += 8
+        elif kind == LEAF_PACKED_DATE:
+            item = new(Date)
+            n = zigzag()
+            # packed from abs(y), negated as a whole for negative years
+            a = abs(n)
+            y = a >> 9
+            item.val = (y if n >= 0 else -y), a >> 5 & 15, a & 31
+        elif kind == LEAF_DATE:
+            item = new(Date)
+            item.val = zigzag(), zigzag(), zigzag()
+        else:
+            item = new(Op)
+            item.val = table[varint()]
+        if tag & LEAF_PRE:
+            item._pre_comments = [comment() for _ in range(varint())]
+        else:
+            item._pre_comments = NO_COMMENTS
+        item.post_comment = comment() if tag & LEAF_POST else None
+        return item
+
+    def node():
+        nonlocal pos
+        tag = data[pos]
+        pos += 1
+        # the common cases are inlined; this is the hot loop of a cache hit
+        if tag == LEAF_STRING:
+            item = new(String)
+            i = data[pos]
+            if i < 0x80:
+                pos += 1
+            else:
+                i = varint()
+            item.val = table[i]
+            item.force_quote = False
+            item._pre_comments = NO_COMMENTS
+            item.post_comment = None
+        elif tag == NODE_PLAIN_PAIR:
+            item = new(Pair)
+            item.key = node()
+            item.op = plain_op('=')
+            item.value = node()
+        elif tag == NODE_PLAIN_OBJ:
+            item = new(Obj)
+            item.kel = plain_op('{')
+            item._contents = Contents([node() for _ in range(varint())])
+            item.ker = plain_op('}')
+        elif tag < NODE_PAIR:
+            item = leaf(tag)
+        elif tag == NODE_PAIR:
+            item = new(Pair)
+            item.key = node()
+            tag = data[pos]
+            pos += 1
+            item.op = leaf(tag)
+            item.value = node()
+        else:
+            item = new(Obj)
+            tag = data[pos]
+            pos += 1
+            item.kel = leaf(tag)
+            item._contents = Contents([node() for _ in range(varint())])
+            tag = data[pos]
+            pos += 1
+            item.ker = leaf(tag)
+        return item
+
+    if data[:len(TREE_MAGIC)] != TREE_MAGIC:
+        return None
+    pos = len(TREE_MAGIC)
+    if varint() != VERSION:
+        return None
+    count = varint()
+    if varint():
+        table = []
+        for _ in range(count):
+            size = varint()
+            table.append(bytes(data[pos:pos + size]).decode())
+            pos += size
+    else:
+        size = varint()
+        table = bytes(data[pos:pos + size]).decode().split('\0')
+        pos += size
+    # the tree is acyclic, and letting the cyclic collector rescan every
+    # young node while millions are allocated costs more than the decoding
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        tree = new(TopLevel)
+        tree._contents = Contents([node() for _ in range(varint())])
+        tree.post_comments = [comment() for _ in range(varint())]
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return tree
+
+leaf_size = sys.getsizeof(object.__new__(String))
+pair_size = sys.getsizeof(object.__new__(Pair))
+obj_size = sys.getsizeof(object.__new__(Obj))
+comment_size = sys.getsizeof(object.__new__(Comment))
+
+# estimated bytes a parse tree takes in memory. values and comments are
+# measured; everything else is counted at the size of its class.
+def tree_size(tree):
+    getsizeof = sys.getsizeof
+
+    def comments_size(comments):
+        return getsizeof(comments) + sum(comment_size + getsizeof(c.val)
+                                         for c in comments)
+
+    size = getsizeof(tree) + comments_size(tree.post_comments)
+    stack = [tree.contents]
+    while stack:
+        contents = stack.pop()
+        size += getsizeof(contents)
+        leaves = []
+        for item in contents:
+            if isinstance(item, Pair):
+                size += pair_size
+                leaves.extend((item.key, item.op))
+                item = item.value
+            if isinstance(item, Obj):
+                size += obj_size
+                leaves.extend((item.kel, item.ker))
+                stack.append(item.contents)
+            else:
+                leaves.append(item)
+        for leaf in leaves:
+            size += leaf_size
+            # op strings are all shared
+            if not isinstance(leaf, Op):
+                size += getsizeof(leaf.val)
+            if leaf._pre_comments:
+                size += comments_size(leaf._pre_comments)
+            if leaf.post_comment is not None:
+                size += comment_size + getsizeof(leaf.post_comment.val)
+    return size
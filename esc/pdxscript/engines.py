@@ -0,0 +1,334 @@
+import re
+from funcparserlib.parser import NoParseError
+from pdxscript.nodes import TopLevel, String, Number, Date, Op, Pair, Obj
+from pdxscript import source as tracked
+
+# what may follow the last token of an item (or its comment) for the item to
+# end a line
+line_end = re.compile(r'[ \t]*(?:\n|\Z)').match
+
+def unexpected(token, expected=None):
+    if token is None:
+        msg = 'got unexpected end of input'
+    else:
+        msg = '{}-{}: got unexpected token: {!r}'.format(
+            '{},{}'.format(*token.start), '{},{}'.format(*token.end),
+            token.value)
+    if expected is not None:
+        msg += ', expected: {!r}'.format(expected)
+    return NoParseError(msg, None)
+
+
+# hand-written alternative to the funcparserlib grammar in
+# SimpleParser.setup_parser. it accepts the same language and builds the same
+# trees, but walks the token stream once with an explicit stack of open
+# blocks instead of materializing the tokens and backtracking.
+class SimpleDescentEngine:
+    brace = 'Brace'
+    op = 'Op'
+    keys = {'Date': Date, 'Number': Number, 'Name': String, 'String': String}
+    quoted = 'String'
+    bare_objs = False
+    # whether bare values and blocks may also appear at the top level
+    top_values = False
+
+    def __init__(self, strict=True):
+        self.strict = strict
+
+    # yields (pre_comments, token, post_comment), then a final unit with
+    # token None holding any trailing comments. pre_comments are strings, and
+    # post_comment is the comment's token
+    def units(self, tokens):
+        for token in tokens:
+            yield None, token, None
+        yield None, None, None
+
+    def node(self, cls, pre, val, post):
+        return cls(val)
+
+    def leaf(self, pre, token, post):
+        val = token.value
+        if token.type == self.quoted:
+            val = val[1:-1]
+        return self.node(self.keys[token.type], pre, val, post)
+
+    def parse(self, tokens):
+        brace, op, keys = self.brace, self.op, self.keys
+        units = self.units(tokens)
+        stack = []
+        contents = []
+        pre, token, post = next(units)
+        while token is not None:
+            type_ = token.type
+            if type_ == brace:
+                if token.value == '}':
+                    if not stack:
+                        raise unexpected(token)
+                    parent, key, key_op, kel = stack.pop()
+                    obj = Obj(kel, contents, self.node(Op, pre, '}', post))
+                    parent.append(obj if key is None else
+                                  Pair(key, key_op, obj))
+                    contents = parent
+                elif self.bare_objs and (stack or self.top_values):
+                    stack.append((contents, None, None,
+                                  self.node(Op, pre, '{', post)))
+                    contents = []
+                else:
+                    raise unexpected(token)
+                pre, token, post = next(units)
+                continue
+            if type_ not in keys:
+                raise unexpected(token)
+            key = self.leaf(pre, token, post)
+            pre, token, post = next(units)
+            if token is None or token.type != op:
+                if not stack and not self.top_values:
+                    raise unexpected(token, '=')
+                contents.append(key)
+                continue
+            key_op = self.node(Op, pre, token.value, post)
+            pre, token, post = next(units)
+            if token is None:
+                raise unexpected(token)
+            if token.type == brace and token.value == '{':
+                stack.append((contents, key, key_op,
+                              self.node(Op, pre, '{', post)))
+                contents = []
+            elif token.type in keys:
+                contents.append(Pair(key, key_op,
+                                     self.leaf(pre, token, post)))
+            else:
+                raise unexpected(token)
+            pre, token, post = next(units)
+        if stack:
+            if self.strict or pre:
+                raise unexpected(token, '}')
+            while stack:
+                parent, key, key_op, kel = stack.pop()
+                obj = Obj(kel, contents)
+                parent.append(obj if key is None else Pair(key, key_op, obj))
+                contents = parent
+        return TopLevel(contents, pre)
+
+    # same walk as parse, but yields events instead of building the tree.
+    # ('start', key) and ('end', key) bracket each block (key is None for a
+    # bare block), ('pair', Pair) for each non-block pair and ('value', node)
+    # for each bare value. stream.skipping discards the rest of the
+    # innermost open block without building any nodes for it.
+    def events(self, tokens, stream):
+        brace, op, keys = self.brace, self.op, self.keys
+        units = self.units(tokens)
+        stack = []
+        pre, token, post = next(units)
+        while token is not None:
+            if stream.skipping:
+                stream.skipping = False
+                if not stack:
+                    return
+                depth = 0
+                while token is not None:
+                    if token.type == brace:
+                        if token.value == '{':
+                            depth += 1
+                        elif depth == 0:
+                            break
+                        else:
+                            depth -= 1
+                    pre, token, post = next(units)
+                continue
+            type_ = token.type
+            if type_ == brace:
+                if token.value == '}':
+                    if not stack:
+                        raise unexpected(token)
+                    yield 'end', stack.pop()
+                elif self.bare_objs and (stack or self.top_values):
+                    stack.append(None)
+                    yield 'start', None
+                else:
+                    raise unexpected(token)
+                pre, token, post = next(units)
+                continue
+            if type_ not in keys:
+                raise unexpected(token)
+            key = self.leaf(pre, token, post)
+            pre, token, post = next(units)
+            if token is None or token.type != op:
+                if not stack and not self.top_values:
+                    raise unexpected(token, '=')
+                yield 'value', key
+                continue
+            key_op = self.node(Op, pre, token.value, post)
+            pre, token, post = next(units)
+            if token is None:
+                raise unexpected(token)
+            if token.type == brace and token.value == '{':
+                stack.append(key)
+                pre, token, post = next(units)
+                yield 'start', key
+                continue
+            elif token.type in keys:
+                pair = Pair(key, key_op, self.leaf(pre, token, post))
+                pre, token, post = next(units)
+                yield 'pair', pair
+                continue
+            raise unexpected(token)
+        if stack:
+            if self.strict or pre:
+                raise unexpected(token, '}')
+            while stack:
+                yield 'end', stack.pop()
+
+
+class ParseEvents:
+    """Iterator of (event, node) tuples returned by SimpleParser.iterparse.
+
+    Calling skip() discards the rest of the innermost open block; the next
+    event is then that block's 'end'. At top level it ends the iteration.
+    """
+
+    def __init__(self, engine, tokens):
+        self.skipping = False
+        self._events = engine.events(tokens, self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._events)
+
+    def skip(self):
+        self.skipping = True
+
+
+class FullDescentEngine(SimpleDescentEngine):
+    brace = 'brace'
+    op = 'op'
+    keys = {'date': Date, 'number': Number, 'unquoted_string': String,
+            'quoted_string': String}
+    quoted = 'quoted_string'
+    bare_objs = True
+
+    def units(self, tokens):
+        pre = []
+        held = None
+        for token in tokens:
+            type_ = token.type
+            if held is not None:
+                if type_ == 'comment':
+                    yield pre, held, token
+                    pre, held = [], None
+                    continue
+                yield pre, held, None
+                pre, held = [], None
+            if type_ == 'comment':
+                pre.append(token.value)
+            elif type_ != 'newline':
+                held = token
+        if held is not None:
+            yield pre, held, None
+            pre = []
+        yield pre, None, None
+
+    def node(self, cls, pre, val, post):
+        return cls(pre, val, post and post.value)
+
+    # same walk as parse, over the tokens of a regex tokenizer, which know
+    # their offsets in source. the tree is made of the tracked nodes of
+    # pdxscript.source, and each item gets its span: it starts where the
+    # item (or the kel) before it ends, and ends after the newline ending
+    # its own last line, or at its last token if more follows on that line.
+    def parse_source(self, tokens, source):
+        brace, op, keys, quoted = self.brace, self.op, self.keys, self.quoted
+
+        def leaf(pre, token, post):
+            val = token.value
+            if token.type == quoted:
+                val = val[1:-1]
+            return tracked.leaf(keys[token.type], pre, val,
+                                post and post.value)
+
+        # sets item's span, if there is an item; returns where the next
+        # item starts
+        def place(item, start, token, post):
+            last = post or token
+            end = last.offset + len(last.value)
+            m = line_end(source, end)
+            if m is not None:
+                end = m.end()
+            if item is not None:
+                item.span = source, start, end, len(stack)
+            return end
+
+        units = self.units(tokens)
+        stack = []
+        contents = []
+        boundary = 0
+        pre, token, post = next(units)
+        while token is not None:
+            type_ = token.type
+            if type_ == brace:
+                if token.value == '}':
+                    if not stack:
+                        raise unexpected(token)
+                    parent, key, key_op, kel, start = stack.pop()
+                    obj = tracked.obj(kel, contents,
+                                      tracked.leaf(Op, pre, '}',
+                                                   post and post.value))
+                    item = obj if key is None else tracked.pair(key, key_op,
+                                                                obj)
+                    parent.append(item)
+                    contents = parent
+                    boundary = place(item, start, token, post)
+                elif self.bare_objs and (stack or self.top_values):
+                    stack.append((contents, None, None,
+                                  tracked.leaf(Op, pre, '{',
+                                               post and post.value),
+                                  boundary))
+                    contents = []
+                    boundary = place(None, None, token, post)
+                else:
+                    raise unexpected(token)
+                pre, token, post = next(units)
+                continue
+            if type_ not in keys:
+                raise unexpected(token)
+            start = boundary
+            key = leaf(pre, token, post)
+            key_token, key_post = token, post
+            pre, token, post = next(units)
+            if token is None or token.type != op:
+                if not stack and not self.top_values:
+                    raise unexpected(token, '=')
+                contents.append(key)
+                boundary = place(key, start, key_token, key_post)
+                continue
+            key_op = tracked.leaf(Op, pre, token.value, post and post.value)
+            pre, token, post = next(units)
+            if token is None:
+                raise unexpected(token)
+            if token.type == brace and token.value == '{':
+                stack.append((contents, key, key_op,
+                              tracked.leaf(Op, pre, '{', post and post.value),
+                              start))
+                contents = []
+                boundary = place(None, None, token, post)
+            elif token.type in keys:
+                item = tracked.pair(key, key_op, leaf(pre, token, post))
+                contents.append(item)
+                boundary = place(item, start, token, post)
+            else:
+                raise unexpected(token)
+            pre, token, post = next(units)
+        if stack:
+            if self.strict or pre:
+                raise unexpected(token, '}')
+            boundary = None
+            while stack:
+                parent, key, key_op, kel, _ = stack.pop()
+                obj = tracked.obj(kel, contents)
+                parent.append(obj if key is None else
+                              tracked.pair(key, key_op, obj))
+                contents = parent
+        tail = None if boundary is None else (source, boundary, len(source), 0)
+        return tracked.toplevel(contents, pre, tail)
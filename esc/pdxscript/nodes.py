@@ -0,0 +1,917 @@
+import re
+from functools import total_ordering
+from funcparserlib.parser import NoParseError
+
+def first_post_comment(item):
+    if item.post_comment:
+        return item.post_comment.val.split('#', 1)[0].strip()
+    return None
+
+def prepend_post_comment(item, s, force=False):
+    if force or first_post_comment(item) != s:
+        if item.post_comment:
+            s += ' ' + str(item.post_comment)
+        item.post_comment = Comment(s)
+
+def is_codename(string):
+    try:
+        return re.match(r'[ekdcb]_', string) is not None
+    except TypeError:
+        return False
+
+def chars(line, parser):
+    line = str(line)
+    # no tabs and nothing splitlines would split on
+    if line.isprintable():
+        return len(line)
+    try:
+        line = line.splitlines()[-1]
+    except IndexError: # empty string
+        pass
+    col = 0
+    for char in line:
+        if char == '\t':
+            col = (col // parser.indent_width + 1) * parser.indent_width
+        else:
+            col += 1
+    return col
+
+def comments_to_str(parser, comments, indent):
+    s = ''
+    if indent == 0 and comments and comments[0].val.startswith('-*-'):
+        s = str(comments[0]) + '\n\n'
+        comments = comments[1:]
+    if not comments:
+        return s
+    indent_str = '\t' if parser.tab_indents else ' ' * parser.indent_width
+    sep = '\n' + indent * indent_str
+    comments_str = '\n'.join(c.val for c in comments)
+    if comments_str == '':
+        return s
+    try:
+        tree = parser.parse(comments_str)
+        if not tree.contents:
+            raise ValueError()
+    except (NoParseError, ValueError):
+        butlast = comments_to_str(parser, comments[:-1], indent)
+        if butlast:
+            butlast += indent * indent_str
+        return s + butlast + str(comments[-1]) + '\n'
+    for p in tree:
+        p_is, _ = p.inline_str(parser, indent)
+        p_is_lines = p_is.rstrip().splitlines()
+        s += '#' + p_is_lines[0] + sep
+        s += ''.join('#' + line[len(sep) - 1:] + sep
+                     for line in p_is_lines[1:])
+    if tree.post_comments:
+        s += comments_to_str(parser, tree.post_comments, indent)
+    s = s.rstrip('\t ')
+    return s
+
+
+# what the formatter writes into, so that each piece of output is copied
+# once instead of once per enclosing block. it is only ever asked about, or
+# made to take back, the last few characters written. with a file, whatever
+# is complete is written out between top level items.
+class Output:
+    __slots__ = 'chunks', 'nl', 'file'
+
+    def __init__(self, file=None):
+        self.chunks = []
+        self.nl = 0 # newlines in chunks
+        self.file = file
+
+    def write(self, s):
+        self.chunks.append(s)
+        self.nl += s.count('\n')
+
+    # like s[-i] of everything written so far
+    def last(self, i=1):
+        chunks = self.chunks
+        if chunks and i <= len(chunks[-1]):
+            return chunks[-1][-i]
+        for chunk in reversed(self.chunks):
+            if i <= len(chunk):
+                return chunk[-i]
+            i -= len(chunk)
+        return ''
+
+    # like s[:-n]
+    def trim(self, n):
+        chunks = self.chunks
+        while n > 0 and chunks:
+            chunk = chunks.pop()
+            if n < len(chunk):
+                self.nl -= chunk.count('\n', len(chunk) - n)
+                chunks.append(chunk[:-n])
+                break
+            self.nl -= chunk.count('\n')
+            n -= len(chunk)
+
+    # the place up to which truncate takes back, and after which first looks
+    # and before which drop_before does. drop_before leaves emptied chunks
+    # in place, so marks stay valid
+    def mark(self):
+        return len(self.chunks)
+
+    def first(self, mark):
+        for chunk in self.chunks[mark:]:
+            if chunk:
+                return chunk[0]
+        return ''
+
+    # removes the last character before mark
+    def drop_before(self, mark):
+        chunks = self.chunks
+        for i in range(mark - 1, -1, -1):
+            if chunks[i]:
+                if chunks[i][-1] == '\n':
+                    self.nl -= 1
+                chunks[i] = chunks[i][:-1]
+                return
+
+    def truncate(self, mark):
+        self.nl -= sum(chunk.count('\n') for chunk in self.chunks[mark:])
+        del self.chunks[mark:]
+
+    def flush(self):
+        if self.file is not None:
+            self.file.writelines(self.chunks)
+            self.chunks = []
+
+    def getvalue(self):
+        return ''.join(self.chunks)
+
+
+# parse trees hold millions of nodes, so the node classes use __slots__.
+# they still pickle as the attribute dicts they had before, so pickles made
+# with or without slots load either way.
+class Slotted:
+    __slots__ = ()
+
+    def __getstate__(self):
+        state = getattr(self, '__dict__', {}).copy()
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name == '_pre_comments':
+                    state['pre_comments'] = list(self._pre_comments)
+                elif name == '_contents':
+                    state['contents'] = list(self._contents)
+                else:
+                    state[name] = getattr(self, name, None)
+        return state
+
+    # set as they were, bypassing any __setattr__ of the class
+    def __setstate__(self, state):
+        cls = type(self)
+        for name, value in state.items():
+            if name == 'pre_comments':
+                name = '_pre_comments'
+            elif not hasattr(cls, name):
+                continue # e.g. the version of old cache pickles
+            object.__setattr__(self, name, value)
+
+
+# nodes without pre comments share this instead of each owning an empty list
+NO_COMMENTS = ()
+
+
+class Comment(Slotted):
+    __slots__ = 'val',
+
+    def __init__(self, string):
+        if string and string[0] == '#':
+            string = string[1:]
+        self.val = string.strip()
+
+    def __str__(self):
+        return ('# ' if self.val and self.val[0] != '#' else '#') + self.val
+
+
+class Stringifiable(Slotted):
+    __slots__ = ()
+
+    # what to write instead of formatting the node at indent, if it was
+    # parsed keeping its source and hasn't changed since (see
+    # pdxscript.source). for a top level, that is what followed its items.
+    # line_open says whether what was written before it ended mid-line.
+    def source_text(self, parser, indent, line_open=False):
+        return None
+
+
+# the items of a TopLevel or Obj, which also keeps what is worked out from
+# them for lookups by key. changing them in place drops that. millions are
+# made, so these start unset rather than pay for an __init__.
+class Contents(list):
+    __slots__ = 'dictionary', 'index'
+
+    def changed(self):
+        self.dictionary = None
+        self.index = None
+
+def notifying(method):
+    def wrapper(self, *args, **kwargs):
+        self.changed()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+for name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append',
+             'extend', 'insert', 'pop', 'remove', 'clear', 'sort',
+             'reverse'):
+    setattr(Contents, name, notifying(getattr(list, name)))
+
+
+class Container(Stringifiable):
+    """What TopLevel and Obj share: contents, and lookups by key.
+
+    dictionary maps each key to the value of its first pair. getall, first,
+    last and keys see every pair, using an index of the pairs by key made
+    in one pass when first needed. Both are dropped whenever contents is
+    assigned or changed in place. Changing the key of a pair already in
+    contents isn't noticed, so call contents.changed() after doing that.
+    """
+    __slots__ = '_contents',
+
+    @property
+    def contents(self):
+        return self._contents
+
+    # a list that isn't a Contents is copied into one
+    @contents.setter
+    def contents(self, value):
+        if type(value) is not Contents:
+            value = Contents(value)
+        self._contents = value
+
+    @property
+    def dictionary(self):
+        contents = self._contents
+        dictionary = getattr(contents, 'dictionary', None)
+        if dictionary is None:
+            dictionary = {k.val: v for k, v in reversed(contents)}
+            contents.dictionary = dictionary
+        return dictionary
+
+    def pairs_by_key(self):
+        contents = self._contents
+        index = getattr(contents, 'index', None)
+        if index is None:
+            index = {}
+            for item in contents:
+                if isinstance(item, Pair):
+                    pairs = index.get(item.key.val)
+                    if pairs is None:
+                        index[item.key.val] = [item]
+                    else:
+                        pairs.append(item)
+            contents.index = index
+        return index
+
+    def getall(self, key):
+        return [pair.value for pair in self.pairs_by_key().get(key, ())]
+
+    def first(self, key, default=None):
+        pairs = self.pairs_by_key().get(key)
+        return pairs[0].value if pairs else default
+
+    def last(self, key, default=None):
+        pairs = self.pairs_by_key().get(key)
+        return pairs[-1].value if pairs else default
+
+    def keys(self):
+        return self.pairs_by_key().keys()
+
+
+class TopLevel(Container):
+    __slots__ = 'post_comments',
+
+    def __init__(self, contents=None, post_comments=None):
+        super().__init__()
+        if contents is None:
+            self.contents = []
+        else:
+            self.contents = contents
+        if post_comments is None:
+            self.post_comments = []
+        else:
+            self.post_comments = [Comment(s) for s in post_comments]
+
+    def __len__(self):
+        return len(self.contents)
+
+    def __contains__(self, item):
+        return item in self.contents
+
+    def __iter__(self):
+        return iter(self.contents)
+
+    def __getitem__(self, key):
+        return self.dictionary[key]
+
+    def __reversed__(self):
+        return reversed(self.contents)
+
+    @property
+    def pre_comments(self):
+        return self.contents[0].pre_comments if self.contents else None
+
+    @pre_comments.setter
+    def pre_comments(self, value):
+        if not self.contents:
+            raise RuntimeError('setting pre_comments on empty toplevel')
+        self.contents[0].pre_comments = value
+
+    @property
+    def header_comment(self):
+        c_list = self.pre_comments or self.post_comments
+        if c_list[0].val.startswith('-*-'):
+            return c_list[0].val
+        return None
+
+    @header_comment.setter
+    def header_comment(self, value):
+        del self.header_comment
+        if self.pre_comments is not None:
+            c_list = self.pre_comments
+        else:
+            c_list = self.post_comments
+        c_list.insert(0, value)
+
+    @header_comment.deleter
+    def header_comment(self):
+        if self.pre_comments is not None:
+            c_list = self.pre_comments
+        else:
+            c_list = self.post_comments
+        if (c_list and c_list[0].val.startswith('-*-')):
+            del c_list[0]
+
+    def get(self, *args, **kwargs):
+        return self.dictionary.get(*args, **kwargs)
+
+    # assumes keys occur at most once
+    def has_pair(self, key_val, val_val):
+        return key_val in self.dictionary and self[key_val].val == val_val
+
+    @property
+    def has_pairs(self):
+        return not self.contents or isinstance(self.contents[0], Pair)
+
+    def str(self, parser, indent=0):
+        out = Output()
+        self.write_str(out, parser, indent)
+        return out.getvalue()
+
+    def write_str(self, out, parser, indent=0):
+        line_open = write_items(out, parser, self.contents, indent, True)
+        source = self.source_text(parser, indent, line_open)
+        if source is not None:
+            out.write(source)
+        else:
+            if line_open:
+                out.write('\n')
+            if self.post_comments:
+                out.write(comments_to_str(parser, self.post_comments, indent))
+        out.flush()
+
+
+# writes the items of a block or top level at indent, each from its source
+# text if it has one, and returns whether the last of them ended mid-line.
+# source text brings its own blank lines, so those are only put before
+# formatted items. with flush, the output is flushed after each item.
+def write_items(out, parser, items, indent, flush=False):
+    line_open = False
+    for i, item in enumerate(items):
+        source = item.source_text(parser, indent, line_open)
+        if source is not None:
+            out.write(source)
+            line_open = not source.endswith('\n')
+        else:
+            if line_open:
+                out.write('\n')
+                line_open = False
+            if (i and indent <= parser.newlines_to_depth and
+                (isinstance(items[i - 1].value, Obj) or
+                 isinstance(item.value, Obj))):
+                out.write('\n')
+            item.write_str(out, parser, indent)
+        if flush:
+            out.flush()
+    return line_open
+
+
+class Commented(Stringifiable):
+    __slots__ = '_pre_comments', 'val', 'post_comment'
+
+    def __init__(self, *args):
+        super().__init__()
+        if len(args) == 3:
+            if args[0]:
+                self._pre_comments = [Comment(s) for s in args[0]]
+            else:
+                self._pre_comments = NO_COMMENTS
+            self.val = self.str_to_val(args[1])
+            self.post_comment = Comment(args[2]) if args[2] else None
+        elif len(args) == 2:
+            self._pre_comments = args[1]._pre_comments
+            if isinstance(args[0], str):
+                self.val = self.str_to_val(args[0])
+            else:
+                self.val = args[0]
+            self.post_comment = args[1].post_comment
+        else:
+            self._pre_comments = NO_COMMENTS
+            self.val = self.str_to_val(args[0])
+            self.post_comment = None
+
+    # callers may modify the list in place, so give the node its own first
+    @property
+    def pre_comments(self):
+        if self._pre_comments is NO_COMMENTS:
+            self._pre_comments = []
+        return self._pre_comments
+
+    @pre_comments.setter
+    def pre_comments(self, value):
+        self._pre_comments = value
+
+    @property
+    def has_comments(self):
+        return self._pre_comments or self.post_comment
+
+    def str_to_val(self, string):
+        return string
+
+    def val_str(self):
+        return str(self.val)
+
+    def val_inline_str(self, parser, col=0):
+        s = self.val_str()
+        return s, col + chars(s, parser)
+
+    def str(self, parser, indent=0):
+        s = ''
+        indent_str = '\t' if parser.tab_indents else ' ' * parser.indent_width
+        if self._pre_comments:
+            s += indent * indent_str
+            s += comments_to_str(parser, self._pre_comments, indent)
+        s += indent * indent_str + self.val_str()
+        if self.post_comment:
+            s += ' ' + str(self.post_comment)
+        s += '\n'
+        return s
+
+    def inline_str(self, parser, indent=0, col=0):
+        nl = 0
+        indent_str = '\t' if parser.tab_indents else ' ' * parser.indent_width
+        sep = '\n' + indent * indent_str
+        s = ''
+        if self._pre_comments:
+            if col > indent * parser.indent_width:
+                s += sep
+                nl += 1
+            if isinstance(self, Op) and self.val == '}':
+                pre_indent = indent + 1
+                s += indent_str
+            else:
+                pre_indent = indent
+            # I can't tell the difference if I'm just after, say, "NOT = { "
+            # with indent_width == 8, but whatever. # ?????
+            c_s = (comments_to_str(parser, self._pre_comments, pre_indent) +
+                   sep[1:])
+            s += c_s
+            nl += c_s.count('\n')
+            col = indent * parser.indent_width
+        val_is, col_val = self.val_inline_str(parser, col)
+        s += val_is
+        col = col_val
+        if self.post_comment:
+            s += ' ' + str(self.post_comment) + sep
+            nl += 1
+            col = indent * parser.indent_width
+        return s, (nl, col)
+
+    # the write_ methods are str and inline_str writing into an Output
+    # instead of returning the string. leaves are short, so they just write
+    # what str and inline_str give.
+    def write_str(self, out, parser, indent=0):
+        out.write(self.str(parser, indent))
+
+    def write_inline(self, out, parser, indent=0, col=0):
+        s, (nl, col) = self.inline_str(parser, indent, col)
+        out.write(s)
+        return nl, col
+
+    # the column at which inline_str would end, if the node has no comments
+    # and would be written on one line; None otherwise. nothing is written,
+    # and blocks stop looking as soon as a line would get too long.
+    def oneline_col(self, parser, indent=0, col=0):
+        if self._pre_comments or self.post_comment:
+            return None
+        return self.val_inline_str(parser, col)[1]
+
+
+@total_ordering
+class String(Commented):
+    __slots__ = 'force_quote',
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.force_quote = False
+
+    def val_str(self):
+        s = self.val
+        if self.force_quote or not re.fullmatch(r'\S+', s):
+            s = '"{}"'.format(s)
+        return s
+
+    def __str__(self):
+        return self.val
+
+    def __hash__(self):
+        return hash(self.val)
+
+    def __eq__(self, other):
+        if isinstance(other, String):
+            return self.val == other.val
+        else:
+            return self.val == other
+
+    def __lt__(self, other):
+        if isinstance(other, String):
+            return self.val < other.val
+        else:
+            return self.val < other
+
+
+@total_ordering
+class Number(Commented):
+    __slots__ = ()
+
+    def str_to_val(self, string):
+        try:
+            return int(string)
+        except ValueError:
+            return float(string)
+
+    def __hash__(self):
+        return hash(self.val)
+
+    def __str__(self):
+        return str(self.val)
+
+    def __eq__(self, other):
+        if isinstance(other, Number):
+            return self.val == other.val
+        else:
+            return self.val == other
+
+    def __lt__(self, other):
+        if isinstance(other, Number):
+            return self.val < other.val
+        else:
+            return self.val < other
+
+class Date(Commented):
+    __slots__ = ()
+
+    def str_to_val(self, string):
+        return tuple((int(x) if x else 0) for x in string.split('.'))
+
+    def val_str(self):
+        return '{}.{}.{}'.format(*self.val)
+
+
+class Op(Commented):
+    __slots__ = ()
+
+
+class Pair(Stringifiable):
+    __slots__ = 'key', 'op', 'value'
+
+    def __init__(self, *args):
+        super().__init__()
+        if len(args) == 3:
+            self.key = args[0]
+            self.op = args[1]
+            self.value = args[2]
+        elif len(args) == 2:
+            if isinstance(args[0], Stringifiable):
+                self.key = args[0]
+            else:
+                self.key = String(args[0])
+            self.op = Op('=')
+            if isinstance(args[1], Stringifiable):
+                self.value = args[1]
+            elif isinstance(args[1], list):
+                self.value = Obj(args[1])
+            else:
+                self.value = String(args[1])
+        else:
+            if isinstance(args[0], Stringifiable):
+                self.key = args[0]
+            else:
+                self.key = String(args[0])
+            self.op = Op('=')
+            self.value = Obj([])
+
+    def __iter__(self):
+        yield self.key
+        yield self.value
+
+    @property
+    def pre_comments(self):
+        return self.key.pre_comments
+
+    @pre_comments.setter
+    def pre_comments(self, value):
+        self.key.pre_comments = value
+
+    @property
+    def post_comment(self):
+        return self.val.post_comment
+
+    @post_comment.setter
+    def post_comment(self, value):
+        self.val.post_comment = value
+
+    @property
+    def has_comments(self):
+        return any(x.has_comments for x in (self.key, self.op, self.value))
+
+    def str(self, parser, indent=0):
+        out = Output()
+        self.write_str(out, parser, indent)
+        return out.getvalue()
+
+    def write_str(self, out, parser, indent=0):
+        indent_str = '\t' if parser.tab_indents else ' ' * parser.indent_width
+        out.write(indent * indent_str)
+        self.write_inline(out, parser, indent, indent * parser.indent_width)
+        if out.last().isspace():
+            if indent:
+                out.trim(indent * len(indent_str))
+        else:
+            out.write('\n')
+
+    def inline_str(self, parser, indent=0, col=0):
+        out = Output()
+        nl_col = self.write_inline(out, parser, indent, col)
+        return out.getvalue(), nl_col
+
+    def write_inline(self, out, parser, indent=0, col=0):
+        if (isinstance(self.key, String) and self.key.val in parser.fq_keys
+            and isinstance(self.value, String)):
+            self.value.force_quote = True
+        # key and op are short, so they are put together as a string
+        s = ''
+        nl = 0
+        key_is, (nl_key, col_key) = self.key.inline_str(parser, indent, col)
+        s += key_is
+        nl += nl_key
+        col = col_key
+        if not s[-1].isspace():
+            s += ' '
+            col += 1
+        op_is, (nl_op, col_op) = self.op.inline_str(parser, indent, col)
+        if (col > indent * parser.indent_width and
+            col_op > parser.chars_per_line):
+            if not s[-2].isspace():
+                s = s[:-1]
+            op_s = self.op.str(parser, indent)
+            s += '\n' + op_s
+            nl += 1 + op_s.count('\n')
+            col = indent * parser.indent_width
+        else:
+            if op_is[0] == '\n':
+                s = s[:-1]
+                col -= 1
+            s += op_is
+            nl += nl_op
+            col = col_op
+        if not s[-1].isspace():
+            s += ' '
+            col += 1
+        out.write(s)
+        mark = out.mark()
+        nl_val, col_val = self.value.write_inline(out, parser, indent, col)
+        if out.first(mark) == '\n':
+            out.drop_before(mark)
+        nl += nl_val
+        col = col_val
+        return nl, col
+
+    # keys and ops never end in whitespace, so each is followed by a space
+    def oneline_col(self, parser, indent=0, col=0):
+        if (isinstance(self.key, String) and self.key.val in parser.fq_keys
+            and isinstance(self.value, String)):
+            self.value.force_quote = True
+        col = self.key.oneline_col(parser, indent, col)
+        if col is None:
+            return None
+        col_op = self.op.oneline_col(parser, indent, col + 1)
+        if col_op is None or (col + 1 > indent * parser.indent_width and
+                              col_op > parser.chars_per_line):
+            return None
+        return self.value.oneline_col(parser, indent, col_op + 1)
+
+
+class Obj(Container):
+    __slots__ = 'kel', 'ker'
+
+    def __init__(self, kel, contents=None, ker=None):
+        super().__init__()
+        if contents is None:
+            self.kel = Op('{')
+            self.contents = kel
+            self.ker = Op('}')
+        else:
+            self.kel = kel
+            self.contents = contents
+            self.ker = ker if ker is not None else Op('}')
+
+    def __len__(self):
+        return len(self.contents)
+
+    def __contains__(self, item):
+        return item in self.contents or item in self.dictionary
+
+    def __iter__(self):
+        return iter(self.contents)
+
+    def __getitem__(self, key):
+        return self.dictionary[key]
+
+    def __reversed__(self):
+        return reversed(self.contents)
+
+    @property
+    def pre_comments(self):
+        return self.kel.pre_comments
+
+    @pre_comments.setter
+    def pre_comments(self, value):
+        self.kel.pre_comments = value
+
+    @property
+    def post_comment(self):
+        return self.ker.post_comment
+
+    @post_comment.setter
+    def post_comment(self, value):
+        self.ker.post_comment = value
+
+    @property
+    def has_comments(self):
+        return (self.kel.has_comments or self.ker.has_comments or
+                any(x.has_comments for x in self))
+
+    def get(self, *args, **kwargs):
+        return self.dictionary.get(*args, **kwargs)
+
+    # assumes keys occur at most once
+    def has_pair(self, key_val, val_val):
+        return key_val in self.dictionary and self[key_val].val == val_val
+
+    @property
+    def has_pairs(self):
+        return not self.contents or isinstance(self.contents[0], Pair)
+
+    def str(self, parser, indent=0):
+        out = Output()
+        self.write_str(out, parser, indent)
+        return out.getvalue()
+
+    def write_str(self, out, parser, indent=0):
+        indent_str = '\t' if parser.tab_indents else ' ' * parser.indent_width
+        out.write(indent * indent_str)
+        self.write_inline(out, parser, indent, indent * parser.indent_width)
+        if out.last().isspace():
+            if indent:
+                out.trim(indent * len(indent_str))
+        else:
+            out.write('\n')
+
+    # if the contents would be written on one line after kel, which ended at
+    # col, the column after them and the space before ker, and what to write
+    # for them; None otherwise. a pair is the only item and isn't written
+    # here, so the string is None then.
+    def oneline_contents(self, parser, indent, col):
+        if self.contents and isinstance(self.contents[0], Pair):
+            pair = self.contents[0]
+            if (len(self) > 1 or indent <= parser.no_fold_to_depth or
+                pair.key.val in parser.no_fold_keys):
+                return None
+            col = pair.oneline_col(parser, indent, 1 + col)
+            if col is None or col + 2 > parser.chars_per_line:
+                return None
+            return col + 1, None
+        s = ''
+        for item in self:
+            if (not isinstance(item, Commented) or item._pre_comments or
+                item.post_comment):
+                return None
+            item_s = item.val_str()
+            col += 1 + chars(item_s, parser)
+            if col + 2 > parser.chars_per_line:
+                return None
+            s += ' ' + item_s
+        if self.contents:
+            s += ' '
+            col += 1
+        return col, s
+
+    def oneline_col(self, parser, indent=0, col=0):
+        if self.kel.has_comments or self.ker.has_comments:
+            return None
+        contents = self.oneline_contents(
+            parser, indent, self.kel.oneline_col(parser, indent, col))
+        if contents is None:
+            return None
+        return self.ker.oneline_col(parser, indent, contents[0])
+
+    def inline_str(self, parser, indent=0, col=0):
+        out = Output()
+        nl_col = self.write_inline(out, parser, indent, col)
+        return out.getvalue(), nl_col
+
+    def write_inline(self, out, parser, indent=0, col=0):
+        # up to the contents, what is written is kept as a string, s
+        s = ''
+        nl = 0
+        kel_is, (nl_kel, col_kel) = self.kel.inline_str(parser, indent, col)
+        s += kel_is
+        nl += nl_kel
+        col = col_kel
+        if not (self.kel.has_comments or self.ker._pre_comments):
+            # one line object, if it fits
+            contents = self.oneline_contents(parser, indent, col)
+            if contents is not None:
+                col_oneline, contents_s = contents
+                ker_is, (nl_ker, col_ker) = self.ker.inline_str(
+                    parser, indent, col_oneline)
+                if nl_ker == 0 or (chars(ker_is.splitlines()[0], parser) <=
+                                   parser.chars_per_line):
+                    if contents_s is None:
+                        out.write(s + ' ')
+                        self.contents[0].write_inline(out, parser, indent,
+                                                      1 + col)
+                        s = ' '
+                    else:
+                        s += contents_s
+                    out.write(s + ker_is)
+                    return nl_ker, col_ker
+        indent_str = '\t' if parser.tab_indents else ' ' * parser.indent_width
+        if self.has_pairs:
+            if s[-1].isspace():
+                if indent:
+                    s = s[:-indent * len(indent_str)]
+            else:
+                s += '\n'
+                nl += 1
+            out.write(s)
+            nl_before = out.nl
+            if write_items(out, parser, self.contents, indent + 1):
+                out.write('\n')
+            nl += out.nl - nl_before
+            out.write(indent * indent_str)
+            col = indent * parser.indent_width
+        else:
+            sep = '\n' + (indent + 1) * indent_str
+            sep_col = chars(sep, parser)
+            if s[-1].isspace():
+                s += indent_str
+            else:
+                s += sep
+                nl += 1
+            out.write(s)
+            col = sep_col
+            for item in self:
+                if not out.last().isspace():
+                    out.write(' ')
+                    col += 1
+                mark = out.mark()
+                nl_item, col_item = item.write_inline(out, parser, indent + 1,
+                                                      col)
+                if (col > (indent + 1) * parser.indent_width and
+                    col_item > parser.chars_per_line):
+                    out.truncate(mark)
+                    if not out.last(2).isspace():
+                        out.trim(1)
+                    out.write(sep)
+                    nl += 1
+                    col = sep_col
+                    nl_item, col_item = item.write_inline(out, parser,
+                                                          indent + 1, col)
+                nl += nl_item
+                col = col_item
+            if not out.last().isspace():
+                out.write('\n' + indent * indent_str)
+                nl += 1
+                col = indent * parser.indent_width
+        ker_is, (nl_ker, col_ker) = self.ker.inline_str(parser, indent, col)
+        out.write(ker_is)
+        nl += nl_ker
+        col = col_ker
+        return nl, col
@@ -0,0 +1,664 @@
+import concurrent.futures
+import hashlib
+import os
+import pathlib
+import struct
+import sys
+import threading
+import time
+import traceback
+from funcparserlib.lexer import Token
+from funcparserlib.parser import (some, a, maybe, many, finished, skip,
+                                  forward_decl)
+from pdxscript.nodes import (TopLevel, String, Number, Date, Op, Pair, Obj,
+                             Output)
+from pdxscript.codec import VERSION, dump_tree, load_tree
+from pdxscript.tokenizers import (SimpleTokenizer, FullTokenizer,
+                                  SimpleRegexTokenizer, FullRegexTokenizer)
+from pdxscript.engines import (SimpleDescentEngine, FullDescentEngine,
+                               ParseEvents)
+from pdxscript.cache import (PackFile, CacheWriter, TreeCache, decode_text,
+                             git_present, open_repo, log_entries,
+                             read_commit_index, write_commit_index)
+from pdxscript.vfs import files, file
+
+if git_present:
+    import git
+
+
+class SimpleParser:
+    """Parser for the script files of one game and its mods.
+
+    This is only the engine; each game has a profile subclassing it (see
+    ck2parser and ck3parser) which sets at least gamedir, the vanilla game
+    dir, and cacheroot, under which each parser class keeps its disk cache.
+    Profiles may also change the defaults set in __init__, the tokenizers,
+    the descent engine and the grammar in setup_parser, and may turn off
+    replace_paths for games whose .mod files don't have them.
+    """
+    gamedir = None
+    cacheroot = None
+    replace_paths = True
+    tokenizer = SimpleTokenizer
+    tokenizers = {'funcparserlib': SimpleTokenizer,
+                  'regex': SimpleRegexTokenizer}
+    descent_engine = SimpleDescentEngine
+    repos = {}
+
+    def __init__(self, *moddirs, strict=True, tokenizer=None, engine=None):
+        self.moddirs = list(moddirs)
+        self.basedir = self.gamedir
+        self.strict = strict
+        if tokenizer is not None:
+            self.tokenizer = self.tokenizers[tokenizer]
+        if engine not in (None, 'funcparserlib', 'descent'):
+            raise ValueError('unknown engine {!r}'.format(engine))
+        self.engine = engine or 'funcparserlib'
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.parse_tree_cache = TreeCache()
+        self.memcache_default = False
+        self.diskcache_default = True
+        self.tab_indents = True
+        self.indent_width = 8 # minimum 2
+        self.chars_per_line = 125
+        self.fq_keys = []
+        self.no_fold_keys = []
+        self.no_fold_to_depth = -1
+        self.newlines_to_depth = -1
+        self.crlf = True
+        self.encoding = 'cp1252'
+        # tried if decoding with the default encoding fails
+        self.fallback_encoding = None
+        self.errors = 'replace'
+        self.ignore_cache = False
+        self.pack_cache = False
+        self.content_cache = False
+        self.packs = {}
+        self.write_behind = True
+        self.cache_writer = CacheWriter()
+        self.vanilla_is_repo = True
+        self.cachedir = self.cacheroot / self.__class__.__name__
+        self.cachedir.mkdir(parents=True, exist_ok=True)
+        self.setup_parser()
+
+    def __del__(self):
+        self.cache_writer.flush()
+        if not self.ignore_cache:
+            print('{}: {} hits, {} misses'.format(
+                  self.__class__.__name__, self.cache_hits, self.cache_misses),
+                  file=sys.stderr)
+        memcache = self.parse_tree_cache
+        if memcache.hits or memcache.evictions or len(memcache):
+            print('{}: memcache {} hits, {} misses, {} evictions, {} trees '
+                  '(~{:.1f} MB)'.format(self.__class__.__name__,
+                                        memcache.hits, memcache.misses,
+                                        memcache.evictions, len(memcache),
+                                        memcache.size / 2 ** 20),
+                  file=sys.stderr)
+        if self.cache_writer.writes or self.cache_writer.errors:
+            print('{}: {} cache writes, {} failed, max queue depth {}/{}'
+                  .format(self.__class__.__name__, self.cache_writer.writes,
+                          self.cache_writer.errors,
+                          self.cache_writer.max_depth,
+                          self.cache_writer.maxsize),
+                  file=sys.stderr)
+
+    def setup_parser(self):
+        if self.engine == 'descent':
+            self.toplevel = self.descent_engine(self.strict)
+            return
+        unarg = lambda f: lambda x: f(*x)
+        tokval = lambda x: x.value
+        toktype = lambda t: some(lambda x: x.type == t) >> tokval
+        kel = a(Token('Brace', '{')) >> tokval >> Op
+        ker = a(Token('Brace', '}')) >> tokval >> Op
+        op = toktype('Op') >> Op
+        number = toktype('Number') >> Number
+        date = toktype('Date') >> Date
+        name = toktype('Name') >> String
+        string = toktype('String') >> (lambda s: s[1:-1]) >> String
+        key = date | number | name | string
+        pair = forward_decl()
+        if self.strict:
+            obj = kel + many(pair | string | key) + ker >> unarg(Obj)
+        else:
+            obj = (kel + many(pair | string | key) +
+                   (ker | skip(finished)) >> unarg(Obj))
+        pair.define(key + op + (obj | string | key) >> unarg(Pair))
+        self.toplevel = many(pair) + skip(finished) >> TopLevel
+
+    # keep a file's tree in memory for good, whatever the memcache limits
+    def pin(self, path, **kwargs):
+        try:
+            path = path.resolve()
+        except AttributeError:
+            path = self.file(path).resolve()
+        self.parse_tree_cache.pin(path)
+        kwargs['memcache'] = True
+        return self.parse_file(path, **kwargs)
+
+    def flush(self, path=None):
+        self.cache_writer.flush()
+        if path is None:
+            self.parse_tree_cache.clear()
+        else:
+            self.parse_tree_cache.pop(path)
+
+    def invalidate_repo_cache(self, bad_path=None):
+        if bad_path is None:
+            self.repos.clear()
+        else:
+            bad_repo_path = None
+            for repo_path in self.repos:
+                if repo_path == bad_path or repo_path in bad_path.parents:
+                    bad_repo_path = repo_path
+            if bad_repo_path != None:
+                del self.repos[bad_repo_path]
+
+    # dirty paths are only asked of git for the dirs files are parsed from
+    def get_repo(self, dirpath):
+        for repo_path, (latest_commit, dirty_scopes) in self.repos.items():
+            if repo_path == dirpath or repo_path in dirpath.parents:
+                return repo_path, latest_commit, self.get_dirty_paths(
+                    repo_path, dirty_scopes, dirpath)
+        repo_init_start = time.time()
+        if not git_present:
+            return None
+        try:
+            repo = open_repo(dirpath)
+        except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+            return None
+        repo_path = pathlib.Path(repo.working_tree_dir)
+        latest_commit, how = self.get_latest_commits(repo, repo_path)
+        dirty_scopes = {}
+        self.repos[repo_path] = latest_commit, dirty_scopes
+        print('Repo {} {} in {:g} s'.format(
+              repo_path.name, how, time.time() - repo_init_start),
+              file=sys.stderr)
+        return repo_path, latest_commit, self.get_dirty_paths(
+            repo_path, dirty_scopes, dirpath)
+
+    def get_dirty_paths(self, repo_path, dirty_scopes, dirpath):
+        scope = dirpath.relative_to(repo_path)
+        for parent in (scope,) + tuple(scope.parents):
+            if parent in dirty_scopes:
+                return dirty_scopes[parent]
+        dirty_paths = []
+        status_output = open_repo(repo_path).git.status('--', str(scope),
+                                                        z=True)
+        status_iter = iter(status_output.split('\x00')[:-1])
+        for entry in status_iter:
+            dirty_paths.append(pathlib.Path(entry[3:]))
+            if entry[0] == 'R':
+                next(status_iter)
+        dirty_scopes[scope] = dirty_paths
+        return dirty_paths
+
+    # the map from each tracked file to the latest commit touching it is
+    # saved with the HEAD it is for. when HEAD moves forward, only the new
+    # commits are read; otherwise the whole log is.
+    def get_latest_commits(self, repo, repo_path):
+        index_path = self.cacheroot / 'repos' / (repo_path.name + '.index')
+        head = repo.head.commit.hexsha
+        old_head, latest_commit = read_commit_index(index_path)
+        if old_head == head:
+            return latest_commit, 'loaded'
+        try:
+            is_update = old_head is not None and repo.is_ancestor(old_head,
+                                                                  head)
+        except git.GitCommandError:
+            is_update = False
+        if is_update:
+            how = 'updated'
+            updated = set()
+            log_output = repo.git.log('{}..{}'.format(old_head, head),
+                                      m=True, pretty='format:%h', z=True,
+                                      name_only=True)
+            for commit, file_str in log_entries(log_output):
+                if file_str not in updated:
+                    updated.add(file_str)
+                    latest_commit[file_str] = commit
+        else:
+            how = 'processed'
+            tracked_files = set(repo.git.ls_files(z=True).split('\x00')[:-1])
+            latest_commit = {}
+            log_output = repo.git.log('.', m=True, pretty='format:%h', z=True,
+                                      name_only=True)
+            for commit, file_str in log_entries(log_output):
+                try:
+                    tracked_files.remove(file_str)
+                    latest_commit[file_str] = commit
+                except KeyError:
+                    pass
+                if not tracked_files:
+                    break
+        write_commit_index(index_path, head, latest_commit)
+        return latest_commit, how
+
+    def get_cachename(self, path, encoding):
+        m = hashlib.md5()
+        m.update(encoding.encode())
+        m.update(bytes(path))
+        return m.hexdigest()
+
+    def get_cachepath(self, path, encoding):
+        name = self.get_cachename(path, encoding)
+        if not self.vanilla_is_repo and self.gamedir in path.parents:
+            return self.cachedir / 'vanilla' / name, False
+        repo = self.get_repo(path.parent)
+        if repo is None:
+            if self.vanilla_is_repo and self.gamedir in path.parents:
+                self.vanilla_is_repo = False
+                return self.cachedir / 'vanilla' / name, False
+            return self.cachedir / name, False
+        repo_path, latest_commit, dirty_paths = repo
+        repo_cachedir = self.cachedir / repo_path.name
+        path = path.relative_to(repo_path)
+        if not any(p == path or p in path.parents for p in dirty_paths):
+            return repo_cachedir / latest_commit[str(path)] / name, True
+        return repo_cachedir / name, False
+
+    # in content mode, entries are named for what was parsed rather than
+    # where it came from, so they are valid whatever git or mtimes say
+    def get_content_cachepath(self, contents, encoding):
+        m = hashlib.blake2b(digest_size=16)
+        m.update('{}\0{}\0{}\0'.format(self.__class__.__name__, VERSION,
+                                       encoding).encode())
+        m.update(contents)
+        return self.cachedir / 'content' / m.hexdigest()
+
+    # in pack mode, everything under one repo's (or vanilla's) cache dir is
+    # stored in a single pack beside it, keyed by the rest of the cachepath
+    def get_pack(self, cachepath):
+        parts = cachepath.relative_to(self.cachedir).parts
+        if len(parts) == 1:
+            pack_name, key = 'pack', parts[0]
+        else:
+            pack_name, key = parts[0] + '.pack', '/'.join(parts[1:])
+        pack = self.packs.get(pack_name)
+        if pack is None:
+            # setdefault, since the cache writer may get here concurrently
+            pack = self.packs.setdefault(pack_name,
+                                         PackFile(self.cachedir / pack_name))
+        return pack, key
+
+    def read_cache(self, cachepath, path, is_indexed):
+        if self.pack_cache:
+            pack, key = self.get_pack(cachepath)
+            entry = pack.get(key)
+            if entry is None:
+                return None
+            version, data, written = entry
+            if version != VERSION or not (is_indexed or written >=
+                                          os.path.getmtime(str(path))):
+                return None
+            return data
+        if cachepath.exists() and (is_indexed or
+                                   (os.path.getmtime(str(cachepath)) >=
+                                    os.path.getmtime(str(path)))):
+            return cachepath.read_bytes()
+        return None
+
+    def load_cache(self, path, data):
+        try:
+            return load_tree(data)
+        except (EOFError, IndexError, ValueError, struct.error):
+            print('Error retrieving cache for {}'.format(path),
+                  file=sys.stderr)
+            traceback.print_exc()
+        return None
+
+    # the tree is encoded right away, since callers may modify it once we
+    # return; only the i/o is left to the cache writer
+    def write_cache(self, cachepath, tree):
+        data = dump_tree(tree)
+        if self.write_behind:
+            self.cache_writer.put(self.store_cache, cachepath, data)
+        else:
+            self.store_cache(cachepath, data)
+
+    def store_cache(self, cachepath, data):
+        if self.pack_cache:
+            pack, key = self.get_pack(cachepath)
+            pack.put(key, VERSION, data)
+            return
+        cachepath.parent.mkdir(parents=True, exist_ok=True)
+        # write and rename, so readers never see a partial entry
+        temp_path = cachepath.with_name('{}.{}.{}.tmp'.format(
+            cachepath.name, os.getpid(), threading.get_ident()))
+        try:
+            temp_path.write_bytes(data)
+            os.replace(str(temp_path), str(cachepath))
+        except:
+            try:
+                temp_path.unlink()
+            except FileNotFoundError:
+                pass
+            raise
+
+    def compact_cache(self, *repo_paths):
+        """Rewrite every pack under cachedir without superseded entries or
+        entries from older VERSIONs. For each of the given repos, committed
+        entries are only kept if they are for a tracked file's latest commit
+        (and the parser's default encoding)."""
+        self.cache_writer.flush()
+        live_keys = {}
+        for repo_path in repo_paths:
+            repo = self.get_repo(pathlib.Path(repo_path).resolve())
+            if repo is not None:
+                repo_path, latest_commit, _ = repo
+                live_keys[repo_path.name + '.pack'] = {
+                    commit + '/' + self.get_cachename(
+                        repo_path / file_str, self.cache_encoding(None))
+                    for file_str, commit in latest_commit.items()}
+        for pack_path in sorted(self.cachedir.glob('*pack')):
+            pack = self.packs.pop(pack_path.name, None) or PackFile(pack_path)
+            keys = live_keys.get(pack_path.name)
+            if keys is None:
+                keep = lambda key: True
+            else:
+                keep = lambda key: '/' not in key or key in keys
+            before, after = pack.compact(VERSION, keep)
+            print('{}: {} of {} entries kept'.format(pack_path, after, before),
+                  file=sys.stderr)
+
+    def files(self, glob, reverse=False):
+        yield from files(glob, self.moddirs, self.basedir, reverse=reverse,
+                         replace_paths=self.replace_paths)
+
+    def file(self, glob, reverse=False):
+        return file(glob, self.moddirs, self.basedir, reverse=reverse,
+                    replace_paths=self.replace_paths)
+
+    def merge_parse(self, glob, basedir=None, moddirs=None, **kwargs):
+        """parse files, merge all top level items into one dictionary and return the items of that dictionary"""
+        dictionary = {}
+        for filename, tree in self.parse_files(glob, basedir, moddirs, **kwargs):
+            dictionary.update(tree.dictionary)
+
+        return dictionary.items()
+
+    def parse_files(self, glob, basedir=None, moddirs=None, workers=None,
+                    **kwargs):
+        if moddirs is None:
+            moddirs = self.moddirs
+        if basedir is None:
+            basedir = self.basedir
+        paths = (p for p in files(glob, moddirs, basedir,
+                                  replace_paths=self.replace_paths)
+                 if p.is_file())
+        if self.parallel(workers):
+            yield from self.parse_files_parallel(
+                [p.resolve() for p in paths], workers, **kwargs)
+            return
+        for path in paths:
+            yield path.resolve(), self.parse_file(path, **kwargs)
+
+    # whether parsing with this many workers goes to parse_files_parallel
+    def parallel(self, workers):
+        return workers is not None and workers > 1
+
+    # cache hits are loaded here; misses are parsed by a pool of worker
+    # processes, which also write their disk cache entries. either way the
+    # results come back in the order of paths.
+    def parse_files_parallel(self, paths, workers, encoding=None,
+                             errors=None, memcache=None, diskcache=None):
+        if memcache is None:
+            memcache = self.memcache_default
+        if errors is None:
+            errors = self.errors
+        ignore_cache = (self.ignore_cache or errors != self.errors)
+        key_encoding = self.cache_encoding(encoding)
+        settings = {k: v for k, v in vars(self).items()
+                    if k not in ('toplevel', 'parse_tree_cache', 'packs',
+                                 'cache_writer')}
+        # held here, as loading the rest may evict them from the memcache
+        in_memory = {}
+        cached = {}
+        futures = {}
+        with concurrent.futures.ProcessPoolExecutor(
+                workers, initializer=init_parse_worker,
+                initargs=(type(self), settings, self.repos)) as pool:
+            for path in paths:
+                if not ignore_cache:
+                    tree = self.parse_tree_cache.get(path)
+                    if tree is not None:
+                        in_memory[path] = tree
+                        continue
+                    if self.content_cache:
+                        cachepath = self.get_content_cachepath(
+                            path.read_bytes(), key_encoding)
+                        is_indexed = True
+                    else:
+                        cachepath, is_indexed = self.get_cachepath(
+                            path, key_encoding)
+                    data = self.read_cache(cachepath, path, is_indexed)
+                    if data is not None:
+                        cached[path] = data
+                        continue
+                futures[path] = pool.submit(parse_in_worker, path, encoding,
+                                            errors, diskcache)
+            for path in paths:
+                if path in futures:
+                    tree = load_tree(futures.pop(path).result())
+                    if not ignore_cache:
+                        self.cache_misses += 1
+                        if memcache:
+                            self.parse_tree_cache[path] = tree
+                elif path in cached:
+                    tree = self.load_cache(path, cached.pop(path))
+                    if tree is None:
+                        tree = self.parse_file(path, encoding, errors,
+                                               memcache, diskcache)
+                    else:
+                        self.cache_hits += 1
+                        if memcache:
+                            self.parse_tree_cache[path] = tree
+                else:
+                    tree = in_memory.pop(path)
+                yield path, tree
+
+    def parse_file(self, path, encoding=None, errors=None,
+                   memcache=None, diskcache=None):
+        try:
+            path = path.resolve()
+        except AttributeError:
+            return self.parse_file(self.file(path),
+                                   encoding, errors, memcache, diskcache)
+        if memcache is None:
+            memcache = self.memcache_default
+        if diskcache is None:
+            diskcache = self.diskcache_default
+        if errors is None:
+            errors = self.errors
+        ignore_cache = (self.ignore_cache or errors != self.errors)
+        key_encoding = self.cache_encoding(encoding)
+        contents = None
+        if not ignore_cache:
+            tree = self.parse_tree_cache.get(path)
+            if tree is not None:
+                return tree
+            if self.content_cache:
+                contents = path.read_bytes()
+                cachepath = self.get_content_cachepath(contents,
+                                                       key_encoding)
+                is_indexed = True
+            else:
+                cachepath, is_indexed = self.get_cachepath(path,
+                                                           key_encoding)
+            data = self.read_cache(cachepath, path, is_indexed)
+            if data is not None:
+                tree = self.load_cache(path, data)
+                if tree is not None:
+                    if memcache:
+                        self.parse_tree_cache[path] = tree
+                    self.cache_hits += 1
+                    return tree
+            self.cache_misses += 1
+        try:
+            tree = self.parse(self.read_text(path, contents, encoding,
+                                             errors))
+            if not ignore_cache:
+                if diskcache:
+                    self.write_cache(cachepath, tree)
+                if memcache:
+                    self.parse_tree_cache[path] = tree
+            return tree
+        except:
+            print(path, file=sys.stderr)
+            raise
+
+    # the encoding part of cache names. reading with a fallback is a mode of
+    # its own, as it can give other trees than either encoding alone
+    def cache_encoding(self, encoding):
+        if encoding is not None:
+            return encoding
+        if self.fallback_encoding is None:
+            return self.encoding
+        return '{}|{}'.format(self.encoding, self.fallback_encoding)
+
+    # contents are the file's bytes, if they were read already. with a
+    # fallback, the file is read once and both decodes work on the bytes in
+    # memory; a strict decode stops at the first invalid byte, so a file
+    # that isn't in the default encoding costs little more than one that is
+    def read_text(self, path, contents, encoding, errors):
+        if encoding is None:
+            encoding = self.encoding
+            if self.fallback_encoding is not None:
+                if contents is None:
+                    contents = path.read_bytes()
+                try:
+                    return decode_text(contents, encoding, errors)
+                except UnicodeDecodeError:
+                    return decode_text(contents, self.fallback_encoding,
+                                       errors)
+        if contents is None:
+            with path.open(encoding=encoding, errors=errors) as f:
+                return f.read()
+        return decode_text(contents, encoding, errors)
+
+    def iterparse(self, path, encoding=None, errors=None):
+        try:
+            path = path.resolve()
+        except AttributeError:
+            path = self.file(path)
+        if errors is None:
+            errors = self.errors
+        string = self.read_text(path, None, encoding, errors)
+        return ParseEvents(self.descent_engine(self.strict),
+                           self.tokenizer.tokenize(string))
+
+    def parse(self, string):
+        tokens = self.tokenizer.tokenize(string)
+        if self.engine != 'descent':
+            tokens = list(tokens)
+        tree = self.toplevel.parse(tokens)
+        return tree
+
+    def write(self, tree, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with path.open('w', encoding=self.encoding,
+                           newline=('\r\n' if self.crlf else '\n')) as f:
+                tree.write_str(Output(f), self)
+        except:
+            print(path)
+            raise
+
+worker_parser = None
+
+def init_parse_worker(parser_class, settings, repos):
+    global worker_parser
+    parser_class.repos.update(repos)
+    worker_parser = parser_class.__new__(parser_class)
+    worker_parser.__dict__.update(settings)
+    worker_parser.parse_tree_cache = TreeCache()
+    worker_parser.packs = {}
+    # pool workers exit without running atexit hooks, so write in-line
+    worker_parser.write_behind = False
+    worker_parser.cache_writer = CacheWriter()
+    worker_parser.setup_parser()
+
+def parse_in_worker(path, encoding, errors, diskcache):
+    tree = worker_parser.parse_file(path, encoding, errors, memcache=False,
+                                    diskcache=diskcache)
+    return dump_tree(tree)
+
+
+class FullParser(SimpleParser):
+    tokenizer = FullTokenizer
+    tokenizers = {'funcparserlib': FullTokenizer,
+                  'regex': FullRegexTokenizer}
+    descent_engine = FullDescentEngine
+
+    def __init__(self, *moddirs, **kwargs):
+        super().__init__(*moddirs, **kwargs)
+        # parse_file keeps each file's text in its tree, and write copies
+        # whatever wasn't changed since from it instead of reformatting it
+        # (see pdxscript.source). such trees are never cached.
+        self.keep_source = False
+
+    # trees keeping their source are parsed here, as only their encoded
+    # form comes back from a worker
+    def parallel(self, workers):
+        return not self.keep_source and super().parallel(workers)
+
+    def parse_file(self, path, encoding=None, errors=None,
+                   memcache=None, diskcache=None):
+        if not self.keep_source:
+            return super().parse_file(path, encoding, errors, memcache,
+                                      diskcache)
+        try:
+            path = path.resolve()
+        except AttributeError:
+            return self.parse_file(self.file(path), encoding, errors)
+        if errors is None:
+            errors = self.errors
+        try:
+            return self.parse_source(self.read_text(path, None, encoding,
+                                                    errors))
+        except:
+            print(path, file=sys.stderr)
+            raise
+
+    # the descent engine is used whatever self.engine is, as only it knows
+    # where things are in the source. the tokenizer wants a final newline,
+    # but the spans are taken from the source as it was, so a file without
+    # one is still written back without one while it ends unchanged
+    def parse_source(self, string):
+        tokens = self.tokenizers['regex'].tokenize(
+            string + '\n' if string and not string.endswith('\n') else string)
+        return self.descent_engine(self.strict).parse_source(tokens, string)
+
+    def setup_parser(self):
+        if self.engine == 'descent':
+            self.toplevel = self.descent_engine(self.strict)
+            return
+        unarg = lambda f: lambda x: f(*x)
+        unquote = lambda s: s[1:-1]
+        tokval = lambda x: x.value
+        toktype = lambda t: some(lambda x: x.type == t) >> tokval
+        nl = skip(many(toktype('newline')))
+        end = nl + skip(finished)
+        comment = toktype('comment')
+        commented = lambda x: (many(nl + comment) + nl + x + maybe(comment))
+        unquoted_string = (commented(toktype('unquoted_string')) >>
+                           unarg(String))
+        quoted_string = (commented(toktype('quoted_string') >> unquote) >>
+                         unarg(String))
+        kel = commented(a(Token('brace', '{')) >> tokval) >> unarg(Op)
+        ker = commented(a(Token('brace', '}')) >> tokval) >> unarg(Op)
+        op = commented(toktype('op')) >> unarg(Op)
+        number = commented(toktype('number')) >> unarg(Number)
+        date = commented(toktype('date')) >> unarg(Date)
+        key = unquoted_string | date | number | quoted_string
+        value = forward_decl()
+        pair = key + op + value >> unarg(Pair)
+        if self.strict:
+            obj = kel + many(pair | value) + ker >> unarg(Obj)
+        else:
+            obj = kel + many(pair | value) + (ker | end) >> unarg(Obj)
+        value.define(obj | key | quoted_string)
+        self.toplevel = (many(pair) + many(nl + comment) + end >>
+                         unarg(TopLevel))
@@ -0,0 +1,60 @@
+class Scan:
+    """The files wanted by several consumers, each parsed once.
+
+    add() registers a consumer of the files matching a glob: its callback is
+    called with (path, tree) for each of them, or with (path, index, pair,
+    parents) for each match of the selector, if one is given. Without a
+    callback, add() returns a list that run() fills with those tuples.
+
+    run() parses the union of the files of every glob once each, in the
+    order the consumers were added, and hands each tree to every consumer
+    whose glob matched its file. Each consumer still gets its files in the
+    order of its own glob; trees it isn't ready for yet are held until it is.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.consumers = []
+
+    def add(self, glob, callback=None, selector=None):
+        results = None
+        if callback is None:
+            results = []
+            callback = lambda *args: results.append(args)
+        self.consumers.append((glob, callback, selector))
+        return results
+
+    def run(self, workers=None, **kwargs):
+        parser = self.parser
+        wanted = [[p.resolve() for p in parser.files(glob) if p.is_file()]
+                  for glob, _, _ in self.consumers]
+        paths = list(dict.fromkeys(p for ps in wanted for p in ps))
+        if parser.parallel(workers):
+            trees = parser.parse_files_parallel(paths, workers, **kwargs)
+        else:
+            trees = ((path, parser.parse_file(path, **kwargs))
+                     for path in paths)
+        # how many consumers each path has left, the trees parsed but not
+        # yet handed to all of them, and how far each consumer has got
+        left = {}
+        for ps in wanted:
+            for path in ps:
+                left[path] = left.get(path, 0) + 1
+        held = {}
+        done = [0] * len(wanted)
+        for path, tree in trees:
+            held[path] = tree
+            for i, (_, callback, selector) in enumerate(self.consumers):
+                ps = wanted[i]
+                while done[i] < len(ps) and ps[done[i]] in held:
+                    ready = ps[done[i]]
+                    done[i] += 1
+                    if selector is None:
+                        callback(ready, held[ready])
+                    else:
+                        for s, pair, parents in selector.findall(
+                                held[ready]):
+                            callback(ready, s, pair, parents)
+                    left[ready] -= 1
+                    if not left[ready]:
+                        del held[ready]
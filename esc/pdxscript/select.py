@@ -0,0 +1,193 @@
+import fnmatch
+import re
+from pdxscript.nodes import is_codename, Pair, Obj
+
+# selectors are paths of steps separated by '/', each step matching the key
+# of a pair one block deeper than the step before it:
+#   name        keys equal to name (numbers and dates as written)
+#   e_*, [ek]_? keys matching the glob
+#   *           any key
+#   [codename]  keys passing the named test in Selector.tests
+#   step+       one or more nested levels of keys matching step
+#   **          any number of levels, none included
+# so '*/[codename]/capital' is the capital of each title two levels down,
+# and '**/add_permanent_province_modifier/name' is the name of every such
+# modifier anywhere. steps only match pairs; bare values and bare blocks
+# are never matched or looked into.
+
+# a step: the test of its key (None for any key) and whether it repeats
+DEEP = None, True
+
+def key_text(key):
+    val = key.val
+    return val if isinstance(val, str) else key.val_str()
+
+
+class Selector:
+    """Any number of selectors, matched in a single walk of a tree.
+
+    findall(tree) and iterfind(events) yield (index, pair, parents) for each
+    pair matched, in document order, where index is that of the selector in
+    the order given and parents are the keys of the blocks the pair is in.
+    A pair matched by several selectors is yielded once for each.
+
+    iterfind takes the events of SimpleParser.iterparse and skips every
+    block no selector can match anything in. The blocks of matched pairs
+    are built from their events, with '=' for their ops.
+    """
+
+    tests = {'codename': is_codename}
+
+    def __init__(self, *paths):
+        self.paths = paths
+        self.steps = [self.compile(path) for path in paths]
+        self.states = {}
+        self.transitions = {}
+        self.start = self.closure((s, 0) for s in range(len(paths)))
+
+    def compile(self, path):
+        steps = []
+        for step in path.split('/'):
+            if step == '**':
+                steps.append(DEEP)
+                continue
+            repeat = step.endswith('+')
+            if repeat:
+                step = step[:-1]
+            if not step or step == '**':
+                raise ValueError('bad step in selector: {!r}'.format(path))
+            m = re.fullmatch(r'\[(\w+)\]', step)
+            if m:
+                try:
+                    test = self.tests[m.group(1)]
+                except KeyError:
+                    raise ValueError('unknown test in selector: {!r}'.format(
+                        path)) from None
+            elif step == '*':
+                test = None
+            elif any(c in step for c in '*?['):
+                test = re.compile(fnmatch.translate(step)).match
+            else:
+                test = step.__eq__
+            steps.append((test, repeat))
+        if steps[-1] is DEEP:
+            raise ValueError('selector ends with **: {!r}'.format(path))
+        return steps
+
+    # the states, with those a '**' may skip to, as a shared frozenset
+    def closure(self, states):
+        states = set(states)
+        pending = list(states)
+        while pending:
+            s, i = pending.pop()
+            if self.steps[s][i] is DEEP and (s, i + 1) not in states:
+                states.add((s, i + 1))
+                pending.append((s, i + 1))
+        states = frozenset(states)
+        return self.states.setdefault(states, states)
+
+    # (matched selectors, states inside the value) of a pair with the key
+    # text in a block in the given states; empty states mean nothing inside
+    # can match
+    def transition(self, states, text):
+        try:
+            return self.transitions[states, text]
+        except KeyError:
+            pass
+        matches = set()
+        inner = []
+        for s, i in states:
+            steps = self.steps[s]
+            test, repeat = steps[i]
+            if test is None or test(text):
+                if steps[i] is DEEP:
+                    inner.append((s, i))
+                    continue
+                if i + 1 == len(steps):
+                    matches.add(s)
+                else:
+                    inner.append((s, i + 1))
+                if repeat:
+                    inner.append((s, i))
+        result = tuple(sorted(matches)), self.closure(inner)
+        self.transitions[states, text] = result
+        return result
+
+    def findall(self, tree):
+        yield from self.walk(tree, self.start, [])
+
+    def walk(self, tree, states, parents):
+        transition = self.transition
+        stack = []
+        items = iter(tree)
+        while True:
+            for item in items:
+                if not isinstance(item, Pair):
+                    continue
+                matches, inner = transition(states, key_text(item.key))
+                for s in matches:
+                    yield s, item, tuple(parents)
+                if inner and isinstance(item.value, Obj):
+                    stack.append((items, states))
+                    parents.append(item.key)
+                    items, states = iter(item.value), inner
+                    break
+            else:
+                if not stack:
+                    return
+                items, states = stack.pop()
+                parents.pop()
+
+    def iterfind(self, events):
+        transition = self.transition
+        stack = []
+        parents = []
+        states = self.start
+        for event, node in events:
+            if event == 'pair':
+                matches, _ = transition(states, key_text(node.key))
+                for s in matches:
+                    yield s, node, tuple(parents)
+            elif event == 'start':
+                if node is None:
+                    matches, inner = (), None
+                else:
+                    matches, inner = transition(states, key_text(node))
+                if matches:
+                    pair = Pair(node, Obj(build(events)))
+                    for s in matches:
+                        yield s, pair, tuple(parents)
+                    if inner:
+                        parents.append(node)
+                        yield from self.walk(pair.value, inner, parents)
+                        parents.pop()
+                    continue
+                stack.append(states)
+                parents.append(node)
+                if inner:
+                    states = inner
+                else:
+                    events.skip()
+            elif event == 'end':
+                states = stack.pop()
+                parents.pop()
+
+
+# the contents of a block whose 'start' was just read, up to its 'end'
+def build(events):
+    stack = []
+    contents = []
+    for event, node in events:
+        if event == 'start':
+            stack.append((contents, node))
+            contents = []
+        elif event == 'end':
+            if not stack:
+                break
+            parent, key = stack.pop()
+            obj = Obj(contents)
+            parent.append(obj if key is None else Pair(key, obj))
+            contents = parent
+        else:
+            contents.append(node)
+    return contents
@@ -0,0 +1,220 @@
+from pdxscript.nodes import (NO_COMMENTS, Comment, Contents, TopLevel, String,
+                             Number, Date, Op, Pair, Obj)
+
+# nodes of trees parsed with FullParser.keep_source. each item of a block
+# (or of the top level) has a span, (source, start, end, depth), starting
+# where the item before it (or the kel) ends, so that with the blank lines,
+# comments and spaces before it. it ends after the newline ending its line,
+# or, if something else follows on that line, at its last token. any change
+# to a node, its comments or its contents sets its dirty flag and those of
+# the nodes it is in, and whatever is still clean when written at its old
+# depth is written as its source text.
+#
+# dirty flags spread through parent, the node the parser put a node in. a
+# node moved elsewhere keeps its old parent, but whatever it was put in is
+# dirty for having been changed, so a change to it still reaches all the
+# nodes it is now in. a top level isn't an item, so it is only dirtied by
+# its post comments, after which its span is the text following its items.
+
+class TrackedList(list):
+    __slots__ = 'owner',
+
+    def __init__(self, owner, items=()):
+        super().__init__(items)
+        self.owner = owner
+
+    # copied whole, as appending to a copy would touch an owner that may
+    # not be restored yet
+    def __reduce__(self):
+        return TrackedList, (self.owner, list(self))
+
+def touching(method):
+    def wrapper(self, *args, **kwargs):
+        self.owner.touch()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+for name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append',
+             'extend', 'insert', 'pop', 'remove', 'clear', 'sort',
+             'reverse'):
+    setattr(TrackedList, name, touching(getattr(list, name)))
+
+
+class Tracked:
+    __slots__ = ()
+    # only used by the tracking itself
+    untracked = frozenset(['parent', 'dirty', 'span'])
+
+    # dirty until the parser is done with it
+    def __init__(self, *args):
+        object.__setattr__(self, 'parent', None)
+        object.__setattr__(self, 'dirty', True)
+        object.__setattr__(self, 'span', None)
+        super().__init__(*args)
+
+    def __setattr__(self, name, value):
+        if name not in self.untracked:
+            self.touch()
+        object.__setattr__(self, name, value)
+
+    # the tracking is restored last, and stays off until then, so that
+    # restoring the rest (which may go through setters) doesn't dirty the
+    # copy or reach a parent that isn't restored yet
+    def __setstate__(self, state):
+        object.__setattr__(self, 'parent', None)
+        object.__setattr__(self, 'dirty', True)
+        super().__setstate__({k: v for k, v in state.items()
+                              if k not in Tracked.untracked})
+        for name in Tracked.untracked:
+            object.__setattr__(self, name, state.get(name))
+        if state.get('dirty') is None:
+            object.__setattr__(self, 'dirty', True)
+        # comment lists come back as plain lists; make them tell this node
+        # about changes again
+        pre_comments = getattr(self, '_pre_comments', NO_COMMENTS)
+        if type(pre_comments) is list:
+            object.__setattr__(self, '_pre_comments',
+                               TrackedList(self, pre_comments)
+                               if pre_comments else NO_COMMENTS)
+        if type(getattr(self, 'post_comments', None)) is list:
+            object.__setattr__(self, 'post_comments',
+                               TrackedList(self, self.post_comments))
+
+    def touch(self):
+        node = self
+        while node is not None and not node.dirty:
+            node.dirty = True
+            node = node.parent
+
+    def source_text(self, parser, indent, line_open=False):
+        if self.dirty or self.span is None:
+            return None
+        source, start, end, depth = self.span
+        if depth != indent:
+            return None
+        text = source[start:end]
+        starts_line = start == 0 or source[start - 1] == '\n'
+        if line_open and starts_line:
+            # what it followed on its line was written on another
+            text = '\n' + text
+        elif not line_open and not starts_line:
+            # what it followed on its line was not written before it, so
+            # it starts a line of its own
+            indent_str = ('\t' if parser.tab_indents else
+                          ' ' * parser.indent_width)
+            text = indent * indent_str + text.lstrip(' \t')
+        return text
+
+
+class TrackedComment(Tracked, Comment):
+    __slots__ = 'parent', 'dirty', 'span'
+
+
+class TrackedCommented(Tracked):
+    __slots__ = ()
+
+    # an empty list made on reading doesn't change anything
+    @property
+    def pre_comments(self):
+        if self._pre_comments is NO_COMMENTS:
+            object.__setattr__(self, '_pre_comments', TrackedList(self))
+        return self._pre_comments
+
+    @pre_comments.setter
+    def pre_comments(self, value):
+        self._pre_comments = value
+
+
+class TrackedString(TrackedCommented, String):
+    __slots__ = 'parent', 'dirty', 'span'
+
+
+class TrackedNumber(TrackedCommented, Number):
+    __slots__ = 'parent', 'dirty', 'span'
+
+
+class TrackedDate(TrackedCommented, Date):
+    __slots__ = 'parent', 'dirty', 'span'
+
+
+class TrackedOp(TrackedCommented, Op):
+    __slots__ = 'parent', 'dirty', 'span'
+
+
+class TrackedPair(Tracked, Pair):
+    __slots__ = 'parent', 'dirty', 'span'
+
+
+class TrackedContents(Contents):
+    __slots__ = 'owner',
+
+    def changed(self):
+        super().changed()
+        self.owner.touch()
+
+
+class TrackedObj(Tracked, Obj):
+    __slots__ = 'parent', 'dirty', 'span'
+
+    @property
+    def contents(self):
+        return self._contents
+
+    @contents.setter
+    def contents(self, value):
+        if type(value) is not TrackedContents or value.owner is not self:
+            value = TrackedContents(value)
+            value.owner = self
+        self._contents = value
+
+
+class TrackedTopLevel(Tracked, TopLevel):
+    __slots__ = 'parent', 'dirty', 'span'
+    untracked = Tracked.untracked | {'contents', '_contents'}
+
+
+tracked_leaves = {String: TrackedString, Number: TrackedNumber,
+                  Date: TrackedDate, Op: TrackedOp}
+
+def comment(parent, string):
+    c = TrackedComment(string)
+    c.parent = parent
+    c.dirty = False
+    return c
+
+# the tracked counterparts of the node constructors the parse engines use
+
+def leaf(cls, pre, val, post):
+    node = tracked_leaves[cls](val)
+    if pre:
+        node._pre_comments = TrackedList(node, [comment(node, s)
+                                                for s in pre])
+    if post:
+        node.post_comment = comment(node, post)
+    node.dirty = False
+    return node
+
+def pair(key, op, value):
+    node = TrackedPair(key, op, value)
+    key.parent = op.parent = value.parent = node
+    node.dirty = False
+    return node
+
+def obj(kel, contents, ker=None):
+    if ker is None:
+        ker = leaf(Op, None, '}', None)
+    node = TrackedObj(kel, contents, ker)
+    node.kel.parent = node.ker.parent = node
+    for item in contents:
+        item.parent = node
+    node.dirty = False
+    return node
+
+def toplevel(contents, post_comments, tail):
+    node = TrackedTopLevel(contents)
+    node.post_comments = TrackedList(node, [comment(node, s)
+                                            for s in post_comments])
+    node.span = tail
+    node.dirty = False
+    return node
@@ -0,0 +1,129 @@
+import re
+from funcparserlib.lexer import make_tokenizer, Token, LexerError
+
+class SimpleTokenizer:
+    specs = [
+        ('Comment', (r'#.*',)),
+        ('Space', (r'\s+',)),
+        ('Brace', (r'[{}]',)),
+        ('Op', (r'[<=>]=?',)),
+        ('String', (r'(?s)".*?"',)),
+        ('Key', (r'[^\s"#<=>{}]+',))
+    ]
+    useless = ['Comment', 'Space']
+    t = staticmethod(make_tokenizer(specs))
+
+    @classmethod
+    def tokenize(cls, string):
+        for x in cls.t(string):
+            if x.type not in cls.useless:
+                if x.type == 'Key':
+                    if re.fullmatch(r'-?\d*\.\d*\.\d*', x.value):
+                        x.type = 'Date'
+                    elif re.fullmatch(r'-?\d+(\.\d+)?', x.value):
+                        x.type = 'Number'
+                    else:
+                        x.type = 'Name'
+                yield x
+
+
+class FullTokenizer(SimpleTokenizer):
+    #specs = [
+    #    ('Comment', (r'#(.*\S)?',)),
+    #    ('Space', (r'[ \t]+',)),
+    #    ('NL', (r'\r?\n',)),
+    #    ('Op', (r'[={}]',)),
+    #    ('String', (r'".*?"',)),
+    #    ('Key', (r'[^\s"#={}]+',))
+    #]
+    specs = [
+        ('comment', (r'#(.*\S)?',)),
+        ('whitespace', (r'[ \t]+',)),
+        ('newline', (r'\r?\n',)),
+        ('brace', (r'[{}]',)),
+        ('op', (r'[<=>]=?',)),
+        ('date', (r'-?\d*\.\d*\.\d*',)),
+        ('number', (r'-?\d+(\.\d+)?(?!\w)',)),
+        ('quoted_string', (r'(?s)".*?"',)),
+        ('unquoted_string', (r'[^\s"#<=>{}]+',))
+    ]
+    useless = ['whitespace']
+    t = staticmethod(make_tokenizer(specs))
+
+
+def make_scanner(specs):
+    return re.compile('|'.join('(?P<{}>{})'.format(name, pattern)
+                               for name, pattern in specs) + r'|(?P<_>[\s\S])')
+
+
+class ScannedToken(Token):
+    # (line, column) positions are only worked out from the offset when an
+    # error message asks for them
+    __slots__ = ('type', 'value', 'offset', 'source')
+
+    def __init__(self, type, value, offset, source):
+        self.type = type
+        self.value = value
+        self.offset = offset
+        self.source = source
+
+    def position(self, offset):
+        line = self.source.count('\n', 0, offset) + 1
+        return line, offset - self.source.rfind('\n', 0, offset) - 1
+
+    @property
+    def start(self):
+        line, col = self.position(self.offset)
+        return line, col + 1
+
+    @property
+    def end(self):
+        return self.position(self.offset + len(self.value))
+
+
+# single-pass alternative to the funcparserlib tokenizers above. one master
+# regex tries the specs in order, like make_tokenizer, so token boundaries
+# are identical, but the Date/Number/Name classification is folded into the
+# regex instead of re-matching every Key.
+class SimpleRegexTokenizer:
+    key_end = r'(?![^\s"#<=>{}])'
+    specs = [
+        ('Comment', r'#.*'),
+        ('Space', r'\s+'),
+        ('Brace', r'[{}]'),
+        ('Op', r'[<=>]=?'),
+        ('String', r'"[^"]*"'),
+        ('Date', r'-?\d*\.\d*\.\d*' + key_end),
+        ('Number', r'-?\d+(?:\.\d+)?' + key_end),
+        ('Name', r'[^\s"#<=>{}]+')
+    ]
+    useless = {'Comment', 'Space'}
+    scanner = make_scanner(specs)
+
+    @classmethod
+    def tokenize(cls, string):
+        useless = cls.useless
+        for m in cls.scanner.finditer(string):
+            type_ = m.lastgroup
+            if type_ not in useless:
+                if type_ == '_':
+                    t = ScannedToken(type_, m.group(), m.start(), string)
+                    line, col = t.start
+                    raise LexerError((line, col), string.splitlines()[line - 1])
+                yield ScannedToken(type_, m.group(), m.start(), string)
+
+
+class FullRegexTokenizer(SimpleRegexTokenizer):
+    specs = [
+        ('comment', r'#(?:.*\S)?'),
+        ('whitespace', r'[ \t]+'),
+        ('newline', r'\r?\n'),
+        ('brace', r'[{}]'),
+        ('op', r'[<=>]=?'),
+        ('date', r'-?\d*\.\d*\.\d*'),
+        ('number', r'-?\d+(?:\.\d+)?(?!\w)'),
+        ('quoted_string', r'"[^"]*"'),
+        ('unquoted_string', r'[^\s"#<=>{}]+')
+    ]
+    useless = {'whitespace'}
+    scanner = make_scanner(specs)
@@ -0,0 +1,188 @@
+import fnmatch
+import os
+import pathlib
+import re
+import stat
+
+
+def replace_paths_from_mod(path):
+    result = set()
+    try:
+        modfile = next(path.glob('*.mod'))
+    except StopIteration:
+        return result
+    with open(modfile) as f:
+        for line in f:
+            if match := re.match(r'replace_path\s*=\s*"([^"]+)"', line):
+                result.add(pathlib.Path(match[1]))
+    return result
+
+
+class VirtualFileSystem:
+    """Merged view of the base dir and mod dirs, as the game sees them.
+
+    A path from a later layer overrides the same relative path from earlier
+    layers, and a layer's replace_path dirs hide everything earlier layers
+    have under them, unless replace_paths is false. Each merged directory is
+    listed from the layers once and then kept in memory; a listing is redone
+    only when the mtime of that directory changes in some layer.
+    """
+    def __init__(self, layers, replace_paths=True):
+        self.roots = list(layers)
+        self.layers = [str(d) for d in layers]
+        # the .mod files are only read here
+        self.replace_paths = [{p.parts for p in replace_paths_from_mod(d)}
+                              if replace_paths else set()
+                              for d in self.roots]
+        # dir parts -> (mtime in each layer, {name: (last layer with it,
+        # last layer with it as a dir or None)})
+        self.listings = {}
+        # (layer, parts) -> path, as making them is the bulk of a big glob
+        self.paths = {}
+        # literal path -> its parts and the dir's first layer
+        self.literals = {}
+
+    # only layers from the last one replacing dir (or a parent) contribute
+    def first_layer(self, parts):
+        for i in reversed(range(len(self.layers))):
+            if any(parts[:len(r)] == r for r in self.replace_paths[i]):
+                return i
+        return 0
+
+    def mtimes(self, parts):
+        result = []
+        for layer in self.layers:
+            try:
+                st = os.stat(os.path.join(layer, *parts))
+                result.append(st.st_mtime_ns if stat.S_ISDIR(st.st_mode)
+                              else None)
+            except OSError:
+                result.append(None)
+        return tuple(result)
+
+    def listing(self, parts):
+        mtimes = self.mtimes(parts)
+        try:
+            cached_mtimes, names = self.listings[parts]
+            if cached_mtimes == mtimes:
+                return names
+        except KeyError:
+            pass
+        names = {}
+        for i in range(self.first_layer(parts), len(self.layers)):
+            if mtimes[i] is None:
+                continue
+            try:
+                with os.scandir(os.path.join(self.layers[i], *parts)) as it:
+                    for entry in it:
+                        if entry.is_dir():
+                            names[entry.name] = i, i
+                        else:
+                            names[entry.name] = i, names.get(
+                                entry.name, (None, None))[1]
+            except OSError:
+                continue
+        self.listings[parts] = mtimes, names
+        return names
+
+    def match(self, glob):
+        pattern = pathlib.PurePath(glob)
+        if pattern.anchor:
+            raise NotImplementedError('Non-relative patterns are unsupported')
+        segments = pattern.parts
+        if not segments:
+            raise ValueError('Unacceptable pattern: {!r}'.format(glob))
+        matches = {}
+        seen = set()
+        self.listing(())
+        roots = [i for i, mtime in enumerate(self.listings[()][0])
+                 if mtime is not None]
+        if not roots:
+            return matches
+        # (dir parts, index of next segment, layer the match comes from)
+        stack = [((), 0, roots[-1])]
+        while stack:
+            parts, k, layer = stack.pop()
+            if (parts, k) in seen:
+                continue
+            seen.add((parts, k))
+            if k == len(segments):
+                matches[parts] = layer
+                continue
+            segment = segments[k]
+            last = k + 1 == len(segments)
+            names = self.listing(parts)
+            if segment == '**':
+                # zero or more dirs, as for Path.glob
+                stack.append((parts, k + 1, layer))
+                stack.extend((parts + (name,), k, dir_layer)
+                             for name, (_, dir_layer) in names.items()
+                             if dir_layer is not None)
+            elif any(c in segment for c in '*?['):
+                for name in fnmatch.filter(names, segment):
+                    i, dir_layer = names[name]
+                    if last:
+                        stack.append((parts + (name,), k + 1, i))
+                    elif dir_layer is not None:
+                        stack.append((parts + (name,), k + 1, dir_layer))
+            elif segment in names:
+                i, dir_layer = names[segment]
+                if last or dir_layer is not None:
+                    stack.append((parts + (segment,), k + 1,
+                                  i if last else dir_layer))
+        return matches
+
+    # resolve a path without wildcards by probing the layers from the top,
+    # which needs no listings and one stat per layer at most
+    def lookup(self, path):
+        try:
+            parts, first = self.literals[path]
+        except KeyError:
+            pure_path = pathlib.PurePath(path)
+            if pure_path.anchor or not pure_path.parts:
+                return next(self.glob(path), None)
+            parts = pure_path.parts
+            first = self.first_layer(parts[:-1])
+            self.literals[path] = parts, first
+        for i in reversed(range(first, len(self.layers))):
+            if os.path.exists(os.path.join(self.layers[i], *parts)):
+                path = self.paths.get((i, parts))
+                if path is None:
+                    path = self.paths[i, parts] = self.roots[i].joinpath(
+                        *parts)
+                return path
+        return None
+
+    def glob(self, glob, reverse=False):
+        for parts, i in sorted(self.match(glob).items(), reverse=reverse):
+            path = self.paths.get((i, parts))
+            if path is None:
+                path = self.paths[i, parts] = self.roots[i].joinpath(*parts)
+            yield path
+
+vfs_cache = {}
+
+def get_vfs(moddirs, basedir, replace_paths=True):
+    key = (basedir,) + tuple(moddirs), replace_paths
+    try:
+        return vfs_cache[key]
+    except KeyError:
+        return vfs_cache.setdefault(key, VirtualFileSystem(*key))
+
+# give mod dirs in descending lexicographical order of mod name (Z-A),
+# modified for dependencies as necessary.
+def files(glob, moddirs, basedir, reverse=False, replace_paths=True):
+    yield from get_vfs(moddirs, basedir, replace_paths).glob(glob,
+                                                             reverse=reverse)
+
+# like next(files(path)), but quick for paths without wildcards
+def file(path, moddirs, basedir, reverse=False, replace_paths=True):
+    path = str(path)
+    vfs = get_vfs(moddirs, basedir, replace_paths)
+    if any(c in path for c in '*?['):
+        result = next(vfs.glob(path, reverse=reverse), None)
+    else:
+        result = vfs.lookup(path)
+    if result is None:
+        raise StopIteration
+    return result
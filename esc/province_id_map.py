@@ -6,6 +6,7 @@ import numpy as np
 from PIL import Image, ImageFont, ImageDraw
 from ck2parser import rootpath, csv_rows, SimpleParser
 from print_time import print_time
+import province_ids
 
 @print_time
 def main():
@@ -56,8 +57,7 @@ def main():
     uninhabited_provs = set(range(1, max_provinces)) - inhabited_provs
 
     image = Image.open(str(provinces_path))
-    a = np.array(image).view(dtype='u1,u1,u1')[..., 0]
-    b = np.vectorize(lambda x: rgb_number_map[tuple(x)], otypes=[np.uint16])(a)
+    b = province_ids.decode(image, province_ids.color_table(rgb_number_map))
     font = ImageFont.truetype(str(rootpath / 'ck2utils/esc/NANOTYPE.ttf'), 16)
     mod = parser.moddirs[0].name.lower() + '_' if parser.moddirs else ''
     borders_path = rootpath / (mod + 'borderlayer.png')
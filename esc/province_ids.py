@@ -0,0 +1,212 @@
+import numpy as np
+
+# decoding of province bitmaps (provinces.bmp/png) into rasters of province
+# ids. colours are packed into one uint32 per pixel, 0xRRGGBB, and looked up
+# by binary search in the sorted packed colours of the definitions, which
+# does a whole map in a fraction of a second.
+
+def pack_rgb(a):
+    """Packs the last axis (r, g, b[, a]) of a uint8 array into uint32."""
+    a = np.asarray(a)
+    return (a[..., 0].astype(np.uint32) << 16 |
+            a[..., 1].astype(np.uint32) << 8 | a[..., 2])
+
+def color_table(rgb_ids):
+    """Sorted packed colours and their ids, from a dict of rgb tuples to
+    ids, or an iterable of (id, r, g, b) rows."""
+    if isinstance(rgb_ids, dict):
+        rows = [(number, *rgb) for rgb, number in rgb_ids.items()]
+    else:
+        rows = list(rgb_ids)
+    table = np.array(rows, np.int64).reshape(-1, 4)
+    colors = pack_rgb(table[:, 1:].astype(np.uint8))
+    ids = table[:, 0].astype(np.uint16)
+    order = np.argsort(colors, kind='stable')
+    colors, ids = colors[order], ids[order]
+    # colours given twice go to the last of their ids, as with a dict
+    keep = np.ones(len(colors), bool)
+    keep[:-1] = colors[:-1] != colors[1:]
+    return colors[keep], ids[keep]
+
+def definitions_table(rows, max_provinces=None):
+    """color_table of the rows of a definitions.csv (as read by csv_rows),
+    skipping the header and ids not below max_provinces."""
+    entries = []
+    for row in rows:
+        try:
+            number, r, g, b = (int(x) for x in row[:4])
+        except ValueError:
+            continue
+        if max_provinces is None or number < max_provinces:
+            entries.append((number, r, g, b))
+    return color_table(entries)
+
+def decode(image, table, default=None):
+    """Returns the uint16 raster of the province ids of an image (or an
+    array of its pixels) by the colours of a color_table.
+
+    Colours not in the table get the default id, or, without one, raise a
+    ValueError listing them with their pixel counts and first positions.
+    """
+    if getattr(image, 'mode', 'RGB') not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    a = np.asarray(image)
+    if a.ndim != 3 or a.shape[2] < 3:
+        raise ValueError('not an RGB image: shape {}'.format(a.shape))
+    colors, ids = table
+    keys = pack_rgb(a)
+    if not len(colors):
+        index = np.zeros(keys.shape, np.intp)
+        known = np.zeros(keys.shape, bool)
+    else:
+        index = np.searchsorted(colors, keys)
+        index[index == len(colors)] = 0
+        known = colors[index] == keys
+    result = ids[index] if len(ids) else np.zeros(keys.shape, np.uint16)
+    if not known.all():
+        if default is None:
+            raise ValueError(unknown_colors_report(keys, known))
+        result[~known] = default
+    return result
+
+def unknown_colors_report(keys, known, limit=10):
+    unknown, first, counts = np.unique(keys[~known], return_index=True,
+                                       return_counts=True)
+    ys, xs = (c[first] for c in np.nonzero(~known))
+    lines = ['{} pixels of {} colours not in the province definitions:'.format(
+        counts.sum(), len(unknown))]
+    for color, count, x, y in sorted(zip(unknown.tolist(), counts.tolist(),
+                                         xs.tolist(), ys.tolist()),
+                                     key=lambda t: -t[1])[:limit]:
+        lines.append('  rgb({}, {}, {}): {} pixels, first at ({}, {})'.format(
+            color >> 16, color >> 8 & 255, color & 255, count, x, y))
+    if len(unknown) > limit:
+        lines.append('  ...')
+    return '\n'.join(lines)
+
+def adjacencies(ids, same=False):
+    """Returns (pairs, counts) for the ids of a raster that touch: pairs is
+    an (n, 2) array of ids, lower first, sorted, and counts the numbers of
+    pixel sides they share. Only orthogonal neighbours touch. With same,
+    pixels touching others of their own id also give pairs of that id.
+    """
+    a = np.asarray(ids)
+    if a.size and a.max() > 0xffff:
+        raise ValueError('ids above 65535 in raster')
+    # each pair of neighbouring pixels once, to the right and downwards,
+    # packed into one uint32 as (lower << 16 | higher)
+    codes = []
+    for x, y in ((a[:, :-1], a[:, 1:]), (a[:-1], a[1:])):
+        if same:
+            x, y = x.ravel(), y.ravel()
+        else:
+            differ = x != y
+            x, y = x[differ], y[differ]
+        lo = np.minimum(x, y).astype(np.uint32)
+        hi = np.maximum(x, y).astype(np.uint32)
+        codes.append(lo << 16 | hi)
+    codes, counts = np.unique(np.concatenate(codes), return_counts=True)
+    pairs = np.stack([codes >> 16, codes & 0xffff], axis=1)
+    return pairs.astype(np.uint16), counts
+
+def adjacency_sets(ids, keys=()):
+    """Dict of each id in a raster, and in keys, to the set of the ids it
+    touches, its own included if any two of its pixels touch."""
+    pairs, _ = adjacencies(ids, same=True)
+    result = {key: set() for key in keys}
+    for one, two in pairs.tolist():
+        result.setdefault(one, set()).add(two)
+        result.setdefault(two, set()).add(one)
+    return result
+
+
+class ProvinceStats:
+    """Per-id statistics of an id raster, built in one pass.
+
+    count, min_x, max_x, min_y, max_y, sum_x and sum_y are arrays indexed by
+    id (bounds are -1 for ids not in the raster). The pixels of each id are
+    also kept as a CSR-style index: order, the flat positions of all pixels
+    sorted by id, and start, where each id's run of them starts.
+
+    All of it is in two arrays, table (with a column per statistic) and
+    order, so it can be stored as two .npy files and mapped back with
+    from_arrays.
+    """
+    columns = ('count', 'start', 'min_x', 'max_x', 'min_y', 'max_y',
+               'sum_x', 'sum_y')
+
+    def __init__(self, ids):
+        a = np.asarray(ids)
+        flat = a.ravel()
+        count = np.bincount(flat)
+        n = len(count)
+        table = np.full((n, len(self.columns)), -1, np.int64)
+        table[:, 0] = count
+        table[:, 1] = np.cumsum(count) - count
+        # stable, so each id's pixels stay in row-major order
+        order = np.argsort(flat, kind='stable').astype(np.uint32)
+        self._set_arrays(a.shape, table, order)
+        ys, xs = np.divmod(order, np.uint32(a.shape[1]))
+        present = np.flatnonzero(count)
+        starts = self.start[present]
+        ends = starts + count[present] - 1
+        self.min_y[present] = ys[starts]
+        self.max_y[present] = ys[ends]
+        self.sum_x[:] = 0
+        self.sum_y[:] = 0
+        if len(present):
+            self.min_x[present] = np.minimum.reduceat(xs, starts)
+            self.max_x[present] = np.maximum.reduceat(xs, starts)
+            self.sum_x[present] = np.add.reduceat(xs, starts, dtype=np.int64)
+            self.sum_y[present] = np.add.reduceat(ys, starts, dtype=np.int64)
+
+    @classmethod
+    def from_arrays(cls, shape, table, order):
+        """The stats of a raster of shape, from the table and order of stats
+        made before (which may be read-only maps of them)."""
+        self = cls.__new__(cls)
+        self._set_arrays(tuple(shape), table, order)
+        return self
+
+    def _set_arrays(self, shape, table, order):
+        self.shape = shape
+        self.table = table
+        self.order = order
+        for i, name in enumerate(self.columns):
+            setattr(self, name, table[:, i])
+
+    def __contains__(self, id_):
+        return 0 <= id_ < len(self.count) and self.count[id_] > 0
+
+    def ids(self):
+        """The ids in the raster, ascending."""
+        return np.flatnonzero(self.count)
+
+    def area(self, id_):
+        return int(self.count[id_]) if id_ in self else 0
+
+    def centroid(self, id_):
+        """(x, y) mean of the pixels of an id, floored. Raises ValueError if
+        the id is not in the raster."""
+        if id_ not in self:
+            raise ValueError('id {} is not in the raster'.format(id_))
+        n = self.count[id_]
+        return int(self.sum_x[id_] // n), int(self.sum_y[id_] // n)
+
+    def pixels(self, id_):
+        """(ys, xs) of the pixels of an id, as from np.nonzero."""
+        if id_ not in self:
+            empty = np.zeros(0, np.intp)
+            return empty, empty
+        start = self.start[id_]
+        flat = self.order[start:start + self.count[id_]]
+        return np.unravel_index(flat, self.shape)
+
+    def bounds(self, ids):
+        """(min_x, max_x, min_y, max_y) of the pixels of any of the ids.
+        Raises ValueError if none of them are in the raster."""
+        ids = np.asarray([i for i in ids if i in self], np.intp)
+        if not len(ids):
+            raise ValueError('none of the ids are in the raster')
+        return (int(self.min_x[ids].min()), int(self.max_x[ids].max()),
+                int(self.min_y[ids].min()), int(self.max_y[ids].max()))
@@ -6,7 +6,7 @@ import pickle
 import re
 import sys
 import git
-from ck2parser import rootpath, cachedir, is_codename, SimpleParser
+from ck2parser import rootpath, cachedir, Selector, Scan, SimpleParser
 from print_time import print_time
 
 
@@ -88,62 +88,67 @@ def compare_digests(old, new):
 
 def create_digest_SWMH():
     digest = {'version': {4}}
+    scan = Scan(parser)
 
     buildings = set()
-    for _, tree in parser.parse_files('common/buildings/*.txt'):
+    def scan_buildings(_, tree):
         for n, v in tree:
             for n2, v2 in v:
                 buildings.add((n.val, n2.val))
+    scan.add('common/buildings/*.txt', scan_buildings)
     digest['buildings'] = buildings
 
     culture_groups = set()
     cultures = set()
-    for _, tree in parser.parse_files('common/cultures/*.txt'):
+    def scan_cultures(_, tree):
         for n, v in tree:
             culture_groups.add(n.val)
             for n2, v2 in v:
                 cultures.add(n2.val)
+    scan.add('common/cultures/*.txt', scan_cultures)
     digest['culture_groups'] = culture_groups
     digest['cultures'] = cultures
 
     dynasties = set()
-    for _, tree in parser.parse_files('common/dynasties/*.txt'):
+    def scan_dynasties(_, tree):
         for n, v in tree:
             culture = v['culture'].val if 'culture' in v.dictionary else None
             dynasties.add((n.val, culture))
+    scan.add('common/dynasties/*.txt', scan_dynasties)
     digest['dynasties'] = dynasties
 
     landed_titles = set()
-    for _, tree in parser.parse_files('common/landed_titles/*.txt'):
-        dfs = list(tree)
-        while dfs:
-            n, v = dfs.pop()
-            if is_codename(n.val):
-                landed_titles.add(n.val)
-                dfs.extend(v)
+    scan.add('common/landed_titles/*.txt',
+             lambda path, s, pair, parents: landed_titles.add(pair.key.val),
+             Selector('[codename]+'))
     digest['landed_titles'] = landed_titles
 
     minor_titles = set()
-    for _, tree in parser.parse_files('common/minor_titles/*.txt'):
+    def scan_minor_titles(_, tree):
         for n, v in tree:
             minor_titles.add(n.val)
+    scan.add('common/minor_titles/*.txt', scan_minor_titles)
     digest['minor_titles'] = minor_titles
 
     religions = set()
-    for _, tree in parser.parse_files('common/religions/*.txt'):
+    def scan_religions(_, tree):
         for n, v in tree:
             for n2, v2 in v:
                 religions.add(n2.val)
+    scan.add('common/religions/*.txt', scan_religions)
     digest['religions'] = religions
 
     traits = set()
     trait_index = 0
-    for _, tree in parser.parse_files('common/traits/*.txt'):
+    def scan_traits(_, tree):
+        nonlocal trait_index
         for n, v in tree:
             traits.add((trait_index, n.val))
             trait_index += 1
+    scan.add('common/traits/*.txt', scan_traits)
     digest['traits'] = traits
 
+    scan.run()
     return digest
 
 
@@ -0,0 +1,21 @@
+import pathlib
+import sys
+import pytest
+
+# the scripts import their modules from esc/ itself
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from pdxscript import FullParser
+
+
+@pytest.fixture
+def source_parser(tmp_path):
+    """A FullParser keeping sources, with its game dir and cache in tmp_path
+    """
+    class TestParser(FullParser):
+        gamedir = tmp_path / 'game'
+        cacheroot = tmp_path / 'cache'
+    parser = TestParser()
+    parser.keep_source = True
+    parser.ignore_cache = True
+    return parser
@@ -0,0 +1,20 @@
+from pdxscript import (dump_tree, load_tree, TopLevel, String, Number, Date,
+                       Pair)
+
+
+def dates_tree(dates):
+    return TopLevel([Pair(String('date'), Date(d)) for d in dates])
+
+
+def test_dates_round_trip():
+    dates = ['1066.9.15', '0.1.1', '0.0.0', '-1.2.3', '-1.15.31',
+             '-500.12.31', '-9999.1.1', '9999.12.31', '123456789.7.4',
+             '-123456789.7.4', '1.16.1', '-1.16.32']
+    tree = load_tree(dump_tree(dates_tree(dates)))
+    assert [pair.value.val for pair in tree] == [Date(d).val for d in dates]
+
+
+def test_numbers_round_trip():
+    values = [0, 1, -1, 2 ** 40, -2 ** 40, 0.5, -3.25]
+    tree = TopLevel([Pair(String('x'), Number(str(v))) for v in values])
+    assert [pair.value.val for pair in load_tree(dump_tree(tree))] == values
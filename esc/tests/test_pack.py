@@ -0,0 +1,54 @@
+import multiprocessing
+from pdxscript import PackFile
+
+
+def put_records(path, worker, count):
+    pack = PackFile(path)
+    for i in range(count):
+        # reopen now and then, as a fresh worker would
+        if i % 10 == 0:
+            pack.close()
+        pack.put('{}/{}'.format(worker, i), 1, bytes([worker]) * (i * 37))
+
+
+def test_concurrent_puts(tmp_path):
+    path = tmp_path / 'test.pack'
+    workers = [multiprocessing.Process(target=put_records, args=(path, w, 60))
+               for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+        assert p.exitcode == 0
+    pack = PackFile(path)
+    for w in range(4):
+        for i in range(60):
+            version, data, _ = pack.get('{}/{}'.format(w, i))
+            assert version == 1 and bytes(data) == bytes([w]) * (i * 37)
+
+
+def test_partial_tail_is_cut(tmp_path):
+    path = tmp_path / 'test.pack'
+    pack = PackFile(path)
+    pack.put('a', 1, b'data')
+    pack.close()
+    size = path.stat().st_size
+    with path.open('ab') as f:
+        f.write(PackFile.header.pack(1, 1, 100, 0.0) + b'b' + b'x' * 10)
+    pack = PackFile(path)
+    assert bytes(pack.get('a')[1]) == b'data'
+    assert path.stat().st_size == size
+    pack.put('c', 1, b'more')
+    pack.close()
+    assert bytes(PackFile(path).get('c')[1]) == b'more'
+
+
+def test_other_format_is_started_over(tmp_path):
+    path = tmp_path / 'test.pack'
+    path.write_bytes(b'oldpack\x00' + b'x' * 40)
+    pack = PackFile(path)
+    assert pack.get('a') is None
+    pack.put('a', 1, b'data')
+    pack.close()
+    assert path.read_bytes().startswith(PackFile.magic)
+    assert bytes(PackFile(path).get('a')[1]) == b'data'
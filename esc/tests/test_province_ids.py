@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+import province_ids
+
+
+def test_stats_match_pixels():
+    rng = np.random.default_rng(0)
+    ids = rng.integers(1, 40, (57, 83)).astype(np.uint16)
+    ids[ids == 7] = 8
+    stats = province_ids.ProvinceStats(ids)
+    stats = province_ids.ProvinceStats.from_arrays(ids.shape, stats.table,
+                                                   stats.order)
+    for i in range(45):
+        ys, xs = np.nonzero(ids == i)
+        assert (i in stats) == bool(len(ys))
+        assert stats.area(i) == len(ys)
+        if len(ys):
+            assert stats.bounds([i]) == (xs.min(), xs.max(),
+                                         ys.min(), ys.max())
+            assert stats.centroid(i) == (xs.sum() // len(xs),
+                                         ys.sum() // len(ys))
+            pixel_ys, pixel_xs = stats.pixels(i)
+            assert (pixel_ys == ys).all() and (pixel_xs == xs).all()
+
+
+@pytest.mark.parametrize('id_', [0, 7, 40, 1000, -1])
+def test_centroid_of_absent_id(id_):
+    ids = np.array([[1, 3], [3, 8]], np.uint16)
+    stats = province_ids.ProvinceStats(ids)
+    with pytest.raises(ValueError):
+        stats.centroid(id_)
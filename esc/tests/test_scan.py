@@ -0,0 +1,18 @@
+from pdxscript import Scan
+
+FILES = {'a.txt': 'a = 1\nb = 2\n', 'b.txt': 'c = { d = 3 } # e\n'}
+
+
+def test_keep_source_parses_serially(source_parser):
+    common = source_parser.gamedir / 'common'
+    common.mkdir(parents=True)
+    for name, text in FILES.items():
+        (common / name).write_text(text)
+    scan = Scan(source_parser)
+    results = scan.add('common/*.txt')
+    scan.run(workers=4)
+    assert [path.name for path, _ in results] == list(FILES)
+    for path, tree in results:
+        assert not tree.dirty
+        assert tree.contents[0].span is not None
+        assert tree.contents[0].source_text(source_parser, 0) is not None
@@ -0,0 +1,76 @@
+import copy
+import pickle
+import pytest
+from pdxscript import Pair
+
+SOURCE = '''# header
+a = 1 # after a
+b = {
+\tx = 2
+
+\t# before y
+\ty = { 3 4 }
+}
+# end
+'''
+
+
+@pytest.mark.parametrize('clone', [copy.deepcopy,
+                                   lambda t: pickle.loads(pickle.dumps(t))])
+def test_tracked_copy(source_parser, clone):
+    parser = source_parser
+    tree = parser.parse_source(SOURCE)
+    tree_copy = clone(tree)
+    assert tree_copy.str(parser) == SOURCE
+    assert not tree_copy.dirty and not tree_copy.contents[1].dirty
+    b = tree_copy.contents[1].value
+    assert [str(c) for c in b.contents[1].pre_comments] == ['# before y']
+    b.contents[0].value.val = 5
+    assert tree_copy.contents[1].dirty
+    assert 'x = 5' in tree_copy.str(parser)
+    assert '# before y' in tree_copy.str(parser)
+    b.contents[1].pre_comments.append(b.contents[1].pre_comments[0])
+    assert b.contents[1].dirty
+    assert tree.str(parser) == SOURCE
+    assert not tree.contents[1].dirty
+
+
+ONE_LINE_ITEMS = '''a = 1 b = 2  c = "x y" # c
+k = { x = 1 y = { z = 2 } }  l = 3
+m = {
+    n = 1\tflag  = yes o = no }
+'''
+
+
+def test_unchanged_items_on_one_line(source_parser):
+    tree = source_parser.parse_source(ONE_LINE_ITEMS)
+    assert tree.str(source_parser) == ONE_LINE_ITEMS
+    path = source_parser.gamedir / 'out.txt'
+    source_parser.write(tree, path)
+    assert path.read_bytes() == ONE_LINE_ITEMS.replace('\n', '\r\n').encode()
+
+
+def test_changed_item_on_shared_line(source_parser):
+    tree = source_parser.parse_source(ONE_LINE_ITEMS)
+    tree.contents[1].value.val = 5
+    del tree.contents[5].value.contents[0]
+    assert tree.str(source_parser) == '''a = 1
+b = 5
+c = "x y" # c
+k = { x = 1 y = { z = 2 } }  l = 3
+m = {
+\tflag  = yes o = no
+}
+'''
+
+
+@pytest.mark.parametrize('source, appended', [
+    ('a = 1 # c', 'a = 1 # c\nnew = yes\n'),
+    ('a = 1 b = { c = 2 }', 'a = 1 b = { c = 2 }\nnew = yes\n'),
+    ('a = 1\n# end', 'a = 1\nnew = yes\n# end'),
+    ('a = {\n\tb = 1 }  ', 'a = {\n\tb = 1 }  \nnew = yes\n')])
+def test_no_final_newline(source_parser, source, appended):
+    tree = source_parser.parse_source(source)
+    assert tree.str(source_parser) == source
+    tree.contents.append(Pair('new', 'yes'))
+    assert tree.str(source_parser) == appended